@@ -1,17 +1,54 @@
 # agent.py
 from __future__ import annotations
 
-import argparse, os, io, ssl, time, traceback, datetime as dt
-from typing import Dict, List, Tuple
+import argparse, contextlib, os, io, json, random, ssl, threading, time, traceback, datetime as dt
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Tuple
+from zoneinfo import ZoneInfo
 import numpy as np
 import pandas as pd
+import requests
 import yfinance as yf
-import matplotlib.pyplot as plt
+from requests.adapters import HTTPAdapter
 import smtplib
+from email.generator import BytesGenerator
 from email.mime.multipart import MIMEMultipart
 from email.mime.text    import MIMEText
 from email.mime.image   import MIMEImage
 
+from utils._njit import NUMBA_AVAILABLE, aot_kernels_current
+
+try:
+    # AOT-kompiliert (python build_kernels.py) – kein JIT beim ersten Aufruf
+    if not aot_kernels_current():
+        raise ImportError("ta_kernels fehlt oder ist veraltet")
+    from ta_kernels import ta_core as _ta_core
+    FAST_KERNELS = True
+except ImportError:
+    from analysis._kernels import _ta_core
+    FAST_KERNELS = NUMBA_AVAILABLE
+from analysis.data_loader import resample_ohlc
+from analysis.indicators import true_range
+from utils.helpers import decimate
+
+if TYPE_CHECKING:
+    # matplotlib/Pillow erst beim ersten Plot importieren (~0.35 s): Läufe ohne
+    # neue M15-Bar plotten nichts
+    from matplotlib.figure import Figure
+
+try:
+    import numexpr as ne  # optional: RSI-Formel im pandas-Pfad in einer Schleife
+except Exception:
+    ne = None
+
+try:
+    from scipy.signal import lfilter  # optional: EWMA im pandas-Pfad als IIR-Filter
+except Exception:
+    lfilter = None
+
 
 # =========================
 # Konfiguration
@@ -24,103 +61,467 @@ TIMEFRAMES: List[Tuple[str, str]] = [
     ("5m",  "5d"),
 ]
 
+# Intraday-Basis: 5m einmal laden (Yahoo-Limit 60d), 4h/1h/15m daraus resampeln.
+# TIMEFRAMES-Einzeldownloads bleiben als Fallback, falls 5m ausfällt.
+BASE_INTERVAL, BASE_PERIOD = "5m", "60d"
+RESAMPLE_RULES: Dict[str, str] = {"4h": "4h", "1h": "1h", "15m": "15min"}
+
 EMA_FAST, EMA_SLOW = 50, 200
 RSI_LEN, ATR_LEN   = 14, 14
 
+# Indikator-Arrays im Numba-Pfad: float32 halbiert die Bandbreite; der
+# Fehler (RSI ~0.02 Pkt., ATR ~0.3 % rel.) liegt unter der %.5f-Ausgabe.
+IND_DTYPE = np.float32
+
+# Trend-Zeitebenen (in dieser Reihenfolge ausgewertet); nur sie brauchen Indikatoren
+TREND_TFS = ("1d", "4h", "1h", "15m")
+
+# Snapshot-Spalten (letzte Bar je TF) und ihre Positionen
+SNAP_COLS = ["Close", "ema50", "ema200", "atr14", "High", "Low"]
+I_CLOSE, I_EMA50, I_EMA200, I_ATR, I_HIGH, I_LOW = range(len(SNAP_COLS))
+
+# Symbole, die parallel analysiert werden (je Symbol laufen die Downloads
+# zusätzlich parallel, siehe _download_many)
+MAX_SYMBOL_WORKERS = 4
+
+# Ab so vielen Symbolen (und >1 CPU) rendern Prozesse die Charts (matplotlib
+# hält den GIL); darunter lohnt der Prozessstart (Import ~1 s) nicht
+PLOT_PROCS_MIN_SYMBOLS = 4
+
+# Gleichzeitige Yahoo-Abrufe prozessweit begrenzen (Symbole x Intervalle
+# laufen verschachtelt parallel); bei Fehlern exponentiell warten
+MAX_YF_CONCURRENCY = 5
+_YF_SLOTS = threading.BoundedSemaphore(MAX_YF_CONCURRENCY)
+
+# Sammel-Downloads: Ticker je yf.download-Aufruf (URL-Länge/Rate-Limit)
+BATCH_SIZE = 20
+
+# Eine HTTP-Session für alle Yahoo-Abrufe (Keep-Alive). Der Pool muss die
+# Threads eines Sammel-Downloads fassen – beim requests-Default (10) verwirft
+# urllib3 überzählige Verbindungen und baut sie samt TLS-Handshake neu auf.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4,
+                                       pool_maxsize=max(BATCH_SIZE, MAX_YF_CONCURRENCY)))
+
+# Download-Cache: ein Eintrag je (Ticker, Intervall, Periode); frisch, bis die
+# nächste Bar des Intervalls schließt, höchstens aber bis zum nächsten Cron-Lauf
+# (CACHE_MAX_AGE) – sonst bliebe die laufende D1/H4-Bar stundenlang eingefroren.
+# Danach wird nur INCR_PERIOD nachgeladen und angefügt (sofern der Eintrag
+# jünger als INCR_PERIOD ist). --no-cache liest keine Einträge (read_cache=False,
+# von main bis _cache_load durchgereicht), schreibt sie aber.
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+BAR_SECONDS: Dict[str, int] = {"5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "1d": 86400}
+INCR_PERIOD = "2d"
+CACHE_MAX_AGE = 900  # Cron-Takt des Workflows (*/15)
+
+# Letzter ausgewerteter M15-Zeitstempel je Symbol (ns seit Epoch); unverändert
+# -> keine neue Bar, Analyse/Plots/Mail entfallen (außer mit --force)
+STATE_PATH = CACHE_DIR / "state.json"
+
 # =========================
 # Utilities
 # =========================
 def utc_now() -> dt.datetime:
-    return dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
+    return dt.datetime.now(dt.timezone.utc)
+
+# FX handelt von So bis Fr 17:00 New York – in UTC je nach Sommerzeit 21:00
+# oder 22:00, daher über die New-York-Zeit bestimmen
+_NY = ZoneInfo("America/New_York")
+
+def _fx_weekend_close(now: dt.datetime) -> dt.datetime | None:
+    """
+    Beginn des laufenden FX-Wochenendes (Fr 17:00 New York, als UTC), solange
+    der Markt zu ist (bis So 17:00 New York); sonst None.
+    """
+    ny = now.astimezone(_NY)
+    wd = ny.weekday()
+    if not ((wd == 4 and ny.hour >= 17) or wd == 5 or (wd == 6 and ny.hour < 17)):
+        return None
+    fri = ny.date() - dt.timedelta(days=wd - 4)
+    return dt.datetime.combine(fri, dt.time(17), tzinfo=_NY).astimezone(dt.timezone.utc)
+
+def _fx_weekend_done(symbols: List[str], state: Dict[str, int], now: dt.datetime) -> bool:
+    """
+    True, wenn nur FX-Symbole laufen, gerade FX-Wochenende ist und je Symbol die
+    letzte M15-Bar vor Handelsschluss (Start close - 15 min) ausgewertet wurde.
+    Bleibt ein Cron-Lauf vor Schluss aus, holt der nächste die Schluss-Bars nach.
+    """
+    close = _fx_weekend_close(now)
+    if close is None or not symbols or not all(s.endswith("=X") for s in symbols):
+        return False
+    last_bar = pd.Timestamp(close - dt.timedelta(minutes=15)).value
+    return all(state.get(s, 0) >= last_bar for s in symbols)
+
+def _backoff(attempt: int, pause: float) -> float:
+    """Wartezeit nach Versuch `attempt`: pause * 2^(attempt-1) plus Jitter."""
+    return pause * 2 ** (attempt - 1) + random.uniform(0, pause / 2)
+
+def _cache_path(ticker: str, interval: str, period: str) -> Path:
+    safe = ticker.replace("=", "_").replace("/", "_").replace("^", "_")
+    return CACHE_DIR / f"{safe}_{interval}_{period}.pkl"
+
+def _period_delta(period: str) -> pd.Timedelta:
+    """yfinance-Periode ("60d", "6mo", "1y") als Timedelta (Monat = 31 Tage)."""
+    for unit, days in (("mo", 31), ("d", 1), ("y", 366)):
+        if period.endswith(unit):
+            return pd.Timedelta(days=int(period[:-len(unit)]) * days)
+    raise ValueError(f"Unbekannte Periode: {period}")
+
+def _utc_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Index einheitlich auf tz-aware UTC bringen. yf.download liefert intraday UTC,
+    Ticker.history die Börsenzeitzone, Tagesdaten teils tz-naiv (naiv -> als UTC
+    lesen); gemischt ergäbe concat einen object-Index bzw. einen TypeError.
+    """
+    if df is None or df.empty:
+        return df
+    idx = df.index
+    if isinstance(idx, pd.DatetimeIndex) and str(idx.tz) == "UTC":
+        return df
+    return df.set_axis(pd.to_datetime(idx, utc=True), axis=0, copy=False)
+
+def _cache_load(path: Path, read_cache: bool = True) -> Tuple[pd.DataFrame | None, float]:
+    """
+    (Frame, Schreibzeitpunkt) aus dem Cache, (None, 0.0) wenn nicht vorhanden/
+    lesbar oder read_cache=False (--no-cache).
+    """
+    if not read_cache:
+        return None, 0.0
+    try:
+        mtime = path.stat().st_mtime
+        return _utc_index(pd.read_pickle(path)), mtime
+    except FileNotFoundError:
+        return None, 0.0
+    except Exception as e:
+        print(f"[cache] {path.name} unlesbar: {e}")
+        return None, 0.0
+
+def _cache_fresh(mtime: float, interval: str) -> bool:
+    """Frisch, solange seit dem Schreiben keine neue Bar (bzw. kein neuer Cron-Takt) begann."""
+    sec = min(BAR_SECONDS.get(interval, 3600), CACHE_MAX_AGE)
+    return int(mtime // sec) == int(time.time() // sec)
+
+def _fetch_period(cached: pd.DataFrame | None, mtime: float, period: str) -> str:
+    """INCR_PERIOD, wenn der Cache lückenlos ergänzt werden kann, sonst die volle Periode."""
+    if cached is not None and not cached.empty and \
+            time.time() - mtime < _period_delta(INCR_PERIOD).total_seconds():
+        return INCR_PERIOD
+    return period
+
+def _merge(cached: pd.DataFrame, new: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Neue Bars anfügen (überschreibt die zuvor offene letzte Bar), auf `period` kürzen."""
+    df = pd.concat([_utc_index(cached), _utc_index(new)])
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df[df.index >= df.index[-1] - _period_delta(period)]
+
+def _cache_store(path: Path, df: pd.DataFrame) -> None:
+    """Atomar schreiben (tmp + os.replace), parallele Läufe sehen nie halbe Dateien."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        _utc_index(df).to_pickle(tmp)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"[cache] Schreiben fehlgeschlagen: {e}")
+
+def _state_load() -> Dict[str, int]:
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"[state] {STATE_PATH.name} unlesbar: {e}")
+        return {}
 
-def to_float(x):
+def _state_store(state: Dict[str, int]) -> None:
+    """Atomar schreiben wie _cache_store."""
     try:
-        return float(x)
-    except Exception:
-        return np.nan
+        STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = STATE_PATH.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, STATE_PATH)
+    except Exception as e:
+        print(f"[state] Schreiben fehlgeschlagen: {e}")
 
-def safe_download(ticker: str, interval: str, period: str, retries: int = 3, pause: int = 5) -> pd.DataFrame:
+def prefetch(tickers: List[str], interval: str, period: str,
+             retries: int = 2, pause: int = 5, read_cache: bool = True) -> None:
+    """
+    Mehrere Ticker gesammelt per yf.download (threads=True, eine HTTP-Session,
+    max. BATCH_SIZE je Aufruf) laden und je Ticker in den Download-Cache legen –
+    safe_download liest danach von Platte. Nur aus dem Hauptthread aufrufen;
+    Fehler sind unkritisch (fehlende Ticker lädt safe_download einzeln).
+    """
+    # veraltete Einträge nach Abrufperiode (inkrementell / voll) gruppieren
+    cached: Dict[str, pd.DataFrame | None] = {}
+    groups: Dict[str, List[str]] = {}
+    for t in tickers:
+        df, mtime = _cache_load(_cache_path(t, interval, period), read_cache)
+        if df is not None and _cache_fresh(mtime, interval):
+            continue
+        cached[t] = df
+        groups.setdefault(_fetch_period(df, mtime, period), []).append(t)
+
+    for fetch, todo in groups.items():
+        if len(todo) < 2:
+            continue
+        for k in range(0, len(todo), BATCH_SIZE):
+            batch = todo[k:k + BATCH_SIZE]
+            for i in range(1, retries + 1):
+                try:
+                    # ignore_tz=False: Zeitzone behalten (Default bei 1d: tz-naiv), damit
+                    # _utc_index dieselben UTC-Stempel wie bei Ticker.history ergibt
+                    data = yf.download(batch, interval=interval, period=fetch, group_by="ticker",
+                                       auto_adjust=True, actions=False, threads=True, progress=False,
+                                       ignore_tz=False, session=_SESSION)
+                    if isinstance(data, pd.DataFrame) and not data.empty:
+                        break
+                except Exception as e:
+                    print(f"[WARN] Sammel-Download {interval} Versuch {i}/{retries}: {e}")
+                if i < retries:
+                    time.sleep(_backoff(i, pause))
+            else:
+                continue
+            have = set(data.columns.get_level_values(0))
+            for t in batch:
+                if t not in have:
+                    continue
+                df = _utc_index(data[t].dropna(how="all"))
+                df.columns.name = None
+                if df.empty:
+                    continue
+                if fetch != period:
+                    df = _merge(cached[t], df, period)
+                _cache_store(_cache_path(t, interval, period), df)
+
+def safe_download(ticker: str, interval: str, period: str, retries: int = 3, pause: int = 5,
+                  read_cache: bool = True) -> pd.DataFrame:
     """
     YF Download mit Retry. Verhindert Abbruch bei Rate-Limit/Leerdaten.
+    Ergebnisse werden pro (Ticker, Intervall, Periode) auf Platte gecacht und
+    nach Schluss der nächsten Bar nur inkrementell (INCR_PERIOD) ergänzt; schlägt
+    der Abruf fehl, wird der veraltete Eintrag geliefert. Nutzt Ticker.history
+    statt yf.download, weil yf.download globalen Zustand teilt und daher nicht
+    parallel aufgerufen werden darf.
     """
+    path = _cache_path(ticker, interval, period)
+    cached, mtime = _cache_load(path, read_cache)
+    if cached is not None and _cache_fresh(mtime, interval):
+        return cached
+    fetch = _fetch_period(cached, mtime, period)
+
     for i in range(1, retries + 1):
         try:
-            df = yf.download(ticker, interval=interval, period=period, progress=False)
+            with _YF_SLOTS:
+                df = yf.Ticker(ticker, session=_SESSION).history(
+                    interval=interval, period=fetch, auto_adjust=True, actions=False)
             if isinstance(df, pd.DataFrame) and not df.empty:
+                df = _utc_index(df)
+                if fetch != period:
+                    df = _merge(cached, df, period)
+                _cache_store(path, df)
                 return df
         except Exception as e:
             print(f"[WARN] yfinance {interval} Versuch {i}/{retries}: {e}")
-        print(f"[Retry] Keine Daten für {interval}. Warte {pause}s …")
-        time.sleep(pause)
+        if i < retries:
+            wait = _backoff(i, pause)
+            print(f"[Retry] Keine Daten für {interval}. Warte {wait:.1f}s …")
+            time.sleep(wait)
+    if cached is not None:
+        print(f"[cache] {interval}: Abruf fehlgeschlagen – nutze Stand von "
+              f"{dt.datetime.fromtimestamp(mtime, dt.timezone.utc):%H:%M} UTC")
+        return cached
     return pd.DataFrame()
 
+def _ewm(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    ewm(alpha=..., adjust=False).mean() auf einem float64-Array. Ohne NaN als
+    IIR-Filter y[i] = a*x[i] + (1-a)*y[i-1] (lfilter), sonst über pandas
+    (NaN-Gewichtung wie gehabt).
+    """
+    if lfilter is not None and x.size and not np.isnan(x).any():
+        return lfilter([alpha], [1.0, alpha - 1.0], x, zi=[x[0] * (1.0 - alpha)])[0]
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+IND_COLS = ["ema50", "ema200", "rsi14", "atr14"]
+
+def _with_ind(df: pd.DataFrame, block: np.ndarray) -> pd.DataFrame:
+    """
+    (N,4)-Indikatorblock als IND_COLS anhängen. concat statt df[IND_COLS] = block:
+    ein Block-Anhängen statt vier Spalten-Inserts (~3x weniger pandas-Overhead
+    je TF).
+    """
+    return pd.concat([df, pd.DataFrame(block, index=df.index, columns=IND_COLS)],
+                     axis=1, copy=False)
+
 def ta_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Minimal-TA: EMA(50/200), RSI(14), ATR(14). Alles nur mit pandas/numpy.
+    Minimal-TA: EMA(50/200), RSI(14), ATR(14).
+    Mit Numba (AOT oder JIT): ein fusionierter Kernel auf IND_DTYPE-Arrays,
+    ohne Numba über pandas/numpy (float64).
     """
-    df = df.copy()
-    # Sicherstellen, dass Spalten groß geschrieben sind (YF kann variieren)
-    df.columns = [c.title() for c in df.columns]
+    # Sicherstellen, dass Spalten groß geschrieben sind (YF kann variieren).
+    # rename(copy=False) teilt den OHLCV-Block mit dem Input; neue Spalten
+    # landen nur im Ergebnis, der Input bleibt unverändert (keine Tiefkopie).
+    df = df.rename(columns=str.title, copy=False)
 
     close = df["Close"]
 
+    if FAST_KERNELS:
+        return _with_ind(df, _ta_core(
+            close.to_numpy(dtype=IND_DTYPE),
+            df["High"].to_numpy(dtype=IND_DTYPE),
+            df["Low"].to_numpy(dtype=IND_DTYPE),
+            2.0 / (EMA_FAST + 1), 2.0 / (EMA_SLOW + 1), RSI_LEN, ATR_LEN,
+        ))
+
+    # ohne Numba: EWMA direkt auf float64-Arrays (lfilter bzw. pandas), Ergebnis
+    # spaltenweise in einen Block (F-Order -> zusammenhängende Spalten) und
+    # einmal zuweisen
+    c = close.to_numpy(dtype=np.float64)
+    out = np.empty((c.shape[0], 4), order="F")
+
     # EMA
-    df["ema50"]  = close.ewm(span=EMA_FAST, adjust=False).mean()
-    df["ema200"] = close.ewm(span=EMA_SLOW, adjust=False).mean()
+    out[:, 0] = _ewm(c, 2.0 / (EMA_FAST + 1))
+    out[:, 1] = _ewm(c, 2.0 / (EMA_SLOW + 1))
 
     # RSI
-    d = close.diff().to_numpy()
-    gain = np.where(d > 0, d, 0.0).ravel()
-    loss = np.where(d < 0, -d, 0.0).ravel()
-    up   = pd.Series(gain, index=df.index).ewm(alpha=1/RSI_LEN, adjust=False).mean()
-    down = pd.Series(loss, index=df.index).ewm(alpha=1/RSI_LEN, adjust=False).mean()
-    rs = up / (down.replace(0, np.nan))
-    df["rsi14"] = 100 - (100 / (1 + rs))
-
-    # ATR
-    hl = (df["High"] - df["Low"]).abs()
-    hc = (df["High"] - close.shift()).abs()
-    lc = (df["Low"]  - close.shift()).abs()
-    tr = pd.concat([hl, hc, lc], axis=1).max(axis=1)
-    df["atr14"] = tr.ewm(alpha=1/ATR_LEN, adjust=False).mean()
-
-    return df
-
-def detect_trend(price, e50, e200) -> str:
-    price, e50, e200 = to_float(price), to_float(e50), to_float(e200)
-    if np.isnan(price) or np.isnan(e50) or np.isnan(e200): return "FLAT"
-    if price > e50 > e200:  return "UP"
-    if price < e50 < e200:  return "DOWN"
-    if price > e50 >= e200: return "UP"
-    if price < e50 <= e200: return "DOWN"
-    return "FLAT"
-
-def mini_plot(df: pd.DataFrame, title: str) -> bytes:
-    fig = plt.figure(figsize=(5, 2.2), dpi=140)
-    plt.plot(df.index, df["Close"])
-    plt.title(title)
-    plt.tight_layout()
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-    return buf.read()
+    # branchless: fmax liefert für NaN-Diffs (erste Bar, Lücken) 0 wie np.where
+    d = np.diff(c, prepend=np.nan)
+    up   = _ewm(np.fmax(d, 0.0), 1.0 / RSI_LEN)
+    down = _ewm(np.fmax(-d, 0.0), 1.0 / RSI_LEN)
+    if ne is not None:
+        # 100 - 100/(1+up/down) == 100*up/(up+down); down == 0 -> NaN wie unten
+        ne.evaluate("where(dn > 0, 100 * u / (u + dn), nan)",
+                    local_dict={"u": up, "dn": down, "nan": np.nan}, out=out[:, 2])
+    else:
+        rs = up / np.where(down == 0, np.nan, down)
+        out[:, 2] = 100 - (100 / (1 + rs))
+
+    # ATR – True Range direkt auf den Arrays (NaN-tolerant wie max(axis=1))
+    tr = true_range(df["High"].to_numpy(dtype=np.float64),
+                    df["Low"].to_numpy(dtype=np.float64), c)
+    out[:, 3] = _ewm(tr, 1.0 / ATR_LEN)
 
-def send_email(subject: str, text_block: str, inline_images: Dict[str, bytes]) -> bool:
+    return _with_ind(df, out)
+
+# 4-Bit-Code je Zeile: b0 price>e50, b1 price<e50, b2 e50>=e200, b3 e50<=e200
+# UP = b0&b2, DOWN = b1&b3; NaN-Vergleiche sind False -> FLAT
+_TREND_LUT = np.array(["FLAT"] * 16, dtype="<U4")
+_TREND_LUT[[0b0101, 0b1101]] = "UP"
+_TREND_LUT[[0b1010, 0b1110]] = "DOWN"
+
+def detect_trends(arr) -> np.ndarray:
+    """
+    Vektorisiert über Zeilen [price, ema50, ema200] -> "UP"/"DOWN"/"FLAT".
+    UP: price > e50 >= e200, DOWN: price < e50 <= e200, NaN -> FLAT.
     """
-    Versand über Secrets: SMTP_USER, SMTP_PASS, EMAIL_TO, SMTP_HOST, SMTP_PORT
-    (Host/Port defaulten auf Gmail).
+    a = np.asarray(arr, dtype=np.float64).reshape(-1, 3)
+    price, e50, e200 = a[:, 0], a[:, 1], a[:, 2]
+    code = ((price > e50).view(np.uint8)
+            | ((price < e50).view(np.uint8) << 1)
+            | ((e50 >= e200).view(np.uint8) << 2)
+            | ((e50 <= e200).view(np.uint8) << 3))
+    return _TREND_LUT.take(code)
+
+def _mini_figure() -> Figure:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(5, 2.2), dpi=100)
+    FigureCanvasAgg(fig)
+    fig.add_subplot(111)
+    return fig
+
+def mini_plot(df: pd.DataFrame, title: str, fig: Figure | None = None) -> bytes:
     """
-    user = os.getenv("SMTP_USER")
-    pw   = os.getenv("SMTP_PASS")
-    to   = os.getenv("EMAIL_TO")
-    host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    port = int(os.getenv("SMTP_PORT", "587"))
+    Close-Linie als PNG. Ohne pyplot-Zustand: eine übergebene Figure wird
+    geleert und wiederverwendet (main/build_plots zeichnen alles in eine).
+    """
+    fig = fig or _mini_figure()
+    ax = fig.axes[0]
+    ax.clear()
+    close = decimate(df["Close"])  # 200 Punkte reichen bei 500px Breite
+    ax.plot(close.index, close)
+    ax.set_title(title)
+    fig.tight_layout()
+    # Rohpixel direkt als 8-Bit-Palette-PNG kodieren (Linienchart: 64 Farben
+    # reichen) – deutlich kleinere Inline-Bilder als 24/32-Bit-PNG
+    from PIL import Image
+
+    fig.canvas.draw()
+    img = Image.fromarray(np.asarray(fig.canvas.buffer_rgba())[..., :3])
+    buf = io.BytesIO()
+    img.quantize(colors=64).save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+def _smtp_cfg() -> Tuple[str | None, str | None, str | None, str, int]:
+    return (os.getenv("SMTP_USER"), os.getenv("SMTP_PASS"), os.getenv("EMAIL_TO"),
+            os.getenv("SMTP_HOST", "smtp.gmail.com"), int(os.getenv("SMTP_PORT", "587")))
+
+@lru_cache(maxsize=1)
+def _tls_context() -> ssl.SSLContext:
+    # CA-Bundle einmal je Prozess laden, nicht bei jedem starttls
+    return ssl.create_default_context()
+
+def _smtp_login(user: str, pw: str, host: str, port: int) -> smtplib.SMTP:
+    # Port 465: implizites TLS ab dem TCP-Connect (spart EHLO/STARTTLS-Roundtrip),
+    # sonst STARTTLS (587)
+    if port == 465:
+        s = smtplib.SMTP_SSL(host, port, timeout=30, context=_tls_context())
+    else:
+        s = smtplib.SMTP(host, port, timeout=30)
+    try:
+        if port != 465:
+            s.ehlo()
+            s.starttls(context=_tls_context())
+        s.login(user, pw)
+    except BaseException:
+        s.close()  # Socket nicht offen liegen lassen (STARTTLS/Login fehlgeschlagen)
+        raise
+    return s
+
+def smtp_connect() -> smtplib.SMTP | None:
+    """
+    Angemeldete SMTP-Verbindung für mehrere Mails (ein TLS-Handshake/Login
+    statt einem pro Symbol). None bei unvollständiger Env oder Fehler.
+    """
+    user, pw, to, host, port = _smtp_cfg()
+    if not (user and pw and to):
+        return None
+    try:
+        return _smtp_login(user, pw, host, port)
+    except Exception as e:
+        print("[mailer] Verbindung fehlgeschlagen:", repr(e))
+        return None
+
+@lru_cache(maxsize=1)
+def _print_smtp_cfg(has_to: bool, has_user: bool, has_pw: bool, host: str, port: int) -> None:
+    # Env-Übersicht einmal je Lauf (nicht je Mail), in einem Schreibvorgang
+    print(f"[mailer] EMAIL_TO   = {'***' if has_to else 'None'}\n"
+          f"[mailer] SMTP_USER  = {'***' if has_user else 'None'}\n"
+          f"[mailer] SMTP_PASS? = {'JA' if has_pw else 'NEIN'}\n"
+          f"[mailer] HOST/PORT  = {host} {port}")
+
+# HTML-Gerüst einmal vorbereiten; pro Mail nur Block + <img>-Zeilen einsetzen
+_HTML = ("<html><body><pre style='font-family:Menlo,Consolas,monospace'>"
+         "{}</pre><hr>{}</body></html>").format
+_IMG = '<img src="cid:{}"><br>'.format
+
+def send_email(subject: str, text_block: str, inline_images: Dict[str, bytes],
+               conn: smtplib.SMTP | None = None) -> bool:
+    """
+    Versand über Secrets: SMTP_USER, SMTP_PASS, EMAIL_TO (mehrere Adressen
+    kommagetrennt), SMTP_HOST, SMTP_PORT (Host/Port defaulten auf Gmail).
+    Mit `conn` (siehe smtp_connect) wird die
+    bestehende Verbindung genutzt, sonst – oder wenn sie getrennt wurde – eine
+    eigene geöffnet. Nach einem Fehler (außer abgelehnten Empfängern) wird
+    `conn` geschlossen (conn.sock is None), damit der Aufrufer sie nicht
+    weiterverwendet.
+    """
+    user, pw, to, host, port = _smtp_cfg()
 
-    print("[mailer] EMAIL_TO   =", "***" if to else "None")
-    print("[mailer] SMTP_USER  =", "***" if user else "None")
-    print("[mailer] SMTP_PASS? =", "JA" if pw else "NEIN")
-    print("[mailer] HOST/PORT  =", host, port)
+    _print_smtp_cfg(bool(to), bool(user), bool(pw), host, port)
 
     if not (user and pw and to):
         print("[mailer] Abbruch: SMTP-Env unvollständig.")
@@ -128,19 +529,17 @@ def send_email(subject: str, text_block: str, inline_images: Dict[str, bytes]) -
 
     msg = MIMEMultipart("related")
     msg["From"] = user
-    msg["To"] = to
+    # mehrere Empfänger (EMAIL_TO kommagetrennt): eine Nachricht, ein DATA-Befehl
+    rcpts = [a.strip() for a in to.split(",") if a.strip()]
+    msg["To"] = ", ".join(rcpts)
     msg["Subject"] = subject
 
     alt = MIMEMultipart("alternative")
     msg.attach(alt)
     alt.attach(MIMEText(text_block, "plain", "utf-8"))
 
-    html = ["<html><body><pre style='font-family:Menlo,Consolas,monospace'>",
-            text_block, "</pre><hr>"]
-    for cid in inline_images.keys():
-        html.append(f'<img src="cid:{cid}"><br>')
-    html.append("</body></html>")
-    alt.attach(MIMEText("".join(html), "html", "utf-8"))
+    html = _HTML(text_block, "".join(map(_IMG, inline_images)))
+    alt.attach(MIMEText(html, "html", "utf-8"))
 
     for cid, png in inline_images.items():
         img = MIMEImage(png, name=f"{cid}.png")
@@ -148,65 +547,133 @@ def send_email(subject: str, text_block: str, inline_images: Dict[str, bytes]) -
         img.add_header("Content-Disposition", "inline", filename=f"{cid}.png")
         msg.attach(img)
 
+    # einmal als Bytes serialisieren (kein str-Umweg wie as_string), auch für
+    # den Wiederholversuch ohne geteilte Verbindung
+    buf = io.BytesIO()
+    BytesGenerator(buf).flatten(msg, linesep="\r\n")  # wie send_message
+    data = buf.getvalue()
+
     try:
-        with smtplib.SMTP(host, port, timeout=30) as s:
-            s.ehlo()
-            s.starttls(context=ssl.create_default_context())
-            s.login(user, pw)
-            s.sendmail(user, [to], msg.as_string())
+        if conn is not None:
+            try:
+                conn.sendmail(user, rcpts, data)
+                print("[mailer] Mail erfolgreich gesendet.")
+                return True
+            except smtplib.SMTPRecipientsRefused:
+                raise  # Sitzung bleibt gültig (smtplib setzt per RSET zurück)
+            except Exception as e:
+                # Idle-Timeout, Timeout mitten in DATA, 4xx/5xx, ...: Zustand der
+                # Sitzung unklar -> schließen und diese Mail einmal separat senden
+                print("[mailer] Geteilte Verbindung unbrauchbar, sende einzeln:", repr(e))
+                conn.close()
+        with _smtp_login(user, pw, host, port) as s:
+            s.sendmail(user, rcpts, data)
         print("[mailer] Mail erfolgreich gesendet.")
         return True
     except Exception as e:
         print("[mailer] Fehler:", repr(e))
         return False
 
+@lru_cache(maxsize=8)
+def _block_template(keys: Tuple[str, ...]) -> str:
+    # "K1={}\nK2={}…" – einmal je Payload-Form (ANALYSE / NEUTRAL) gebaut
+    return "\n".join(f"{k}={{}}" for k in keys)
+
 def format_block(d: Dict[str, str]) -> str:
-    lines = []
-    for k, v in d.items():
-        lines.append(f"{k}={v}")
-    return "\n".join(lines)
+    return _block_template(tuple(d)).format(*d.values())
 
 
 # =========================
 # Analyse
 # =========================
-def analyze_symbol(symbol: str) -> Dict[str, str]:
-    job_start = utc_now()
+def _download_many(symbol: str, pairs: List[Tuple[str, str]],
+                   read_cache: bool = True) -> Dict[str, pd.DataFrame]:
+    """(Intervall, Periode)-Paare parallel über safe_download laden."""
+    with ThreadPoolExecutor(max_workers=len(pairs)) as ex:
+        futures = {interval: ex.submit(safe_download, symbol, interval, period, retries=3, pause=5,
+                                       read_cache=read_cache)
+                   for interval, period in pairs}
+    return {interval: f.result() for interval, f in futures.items()}
+
+
+def _snapshot(df: pd.DataFrame) -> np.ndarray:
+    """Letzte Bar in SNAP_COLS-Reihenfolge als float64; fehlende Spalten -> NaN."""
+    idx = df.columns.get_indexer(SNAP_COLS)
+    row = df.iloc[-1, idx].to_numpy(dtype=np.float64)
+    row[idx < 0] = np.nan
+    return row
+
+
+def _m15_stamp(frames: Dict[str, pd.DataFrame]) -> int | None:
+    """Zeitstempel (ns) der letzten M15-Bar, None ohne M15-Daten."""
+    df = frames.get("15m")
+    return None if df is None or df.empty else int(df.index.asi8[-1])
+
+
+def analyze_symbol(symbol: str, skip_stamp: int | None = None,
+                   now: dt.datetime | None = None, read_cache: bool = True
+                   ) -> Tuple[Dict[str, str], Dict[str, pd.DataFrame]] | Dict[str, str] | None:
+    """
+    Lädt und wertet ein Symbol aus -> (Payload, Frames) bzw. nur Payload ohne
+    Daten. None, wenn die letzte M15-Bar `skip_stamp` entspricht (nichts Neues
+    seit dem letzten Lauf) – dann ohne Indikator-Rechnung. `now` (UTC) ist der
+    Laufzeitpunkt, den main für alle Symbole einmal bestimmt; read_cache=False
+    (--no-cache) lädt ohne den Download-Cache zu lesen.
+    """
+    now_str = (now or utc_now()).strftime("%Y-%m-%d %H:%M:%S")
+
+    # D1 + 5m-Basis parallel laden (mit Retry), Intraday-TFs per Resampling
+    periods = dict(TIMEFRAMES)
+    raw = _download_many(symbol, [("1d", periods["1d"]), (BASE_INTERVAL, BASE_PERIOD)],
+                         read_cache)
+    base = raw.pop(BASE_INTERVAL)
+    if not base.empty:
+        raw[BASE_INTERVAL] = base
+        for interval, rule in RESAMPLE_RULES.items():
+            raw[interval] = resample_ohlc(base, rule, label="left", closed="left")
+    else:
+        print(f"[WARN] Keine {BASE_INTERVAL}-Basis – lade Intraday-TFs einzeln …")
+        raw.update(_download_many(symbol, [(iv, pe) for iv, pe in TIMEFRAMES if iv != "1d"],
+                                  read_cache))
 
-    # Daten je TF sammeln (mit Retry)
+    if skip_stamp is not None and _m15_stamp(raw) == skip_stamp:
+        return None
+
+    # Auswertung in TIMEFRAMES-Reihenfolge; Indikatoren nur für Trend-TFs
+    # (die 5m-Basis wird nur geplottet – kein Wilder-Lauf über ~17k Bars)
     frames: Dict[str, pd.DataFrame] = {}
-    for interval, period in TIMEFRAMES:
-        df = safe_download(symbol, interval, period, retries=3, pause=5)
+    for interval, _ in TIMEFRAMES:
+        df = raw.get(interval, pd.DataFrame())
         if df.empty:
             print(f"[FEHLER] Endgültig keine Daten für {interval}. Überspringe …")
             continue
-        frames[interval] = ta_indicators(df)
+        frames[interval] = ta_indicators(df) if interval in TREND_TFS else df
 
     if not frames:
         # Nichts geladen – neutraler Fallback, aber E-Mail verschicken
         payload = {
             "TYPE": "NEUTRAL",
             "Hinweis": "Keine TF-Daten (Rate-Limit/Fehler).",
-            "ZeitUTC": utc_now().strftime("%Y-%m-%d %H:%M:%S"),
+            "ZeitUTC": now_str,
         }
         return payload
 
-    # Snapshots (nur vorhandene TFs berücksichtigen)
-    last = {k: v.iloc[-1] for k, v in frames.items()}
+    # Snapshots (nur vorhandene TFs): letzte Bar als float64-Array in SNAP_COLS-Reihenfolge
+    last = {k: _snapshot(v) for k, v in frames.items()}
+    nan_row = np.full(len(SNAP_COLS), np.nan)
 
-    # Trends
-    trend_D1 = detect_trend(*(to_float(last["1d"][c]) for c in ("Close", "ema50", "ema200"))) if "1d" in last else "FLAT"
-    trend_H4 = detect_trend(*(to_float(last["4h"][c]) for c in ("Close", "ema50", "ema200"))) if "4h" in last else "FLAT"
-    trend_H1 = detect_trend(*(to_float(last["1h"][c]) for c in ("Close", "ema50", "ema200"))) if "1h" in last else "FLAT"
-    trend_M15= detect_trend(*(to_float(last["15m"][c]) for c in ("Close", "ema50", "ema200"))) if "15m" in last else "FLAT"
+    # Trends (alle TFs in einem Schritt; fehlende TF -> NaN-Zeile -> FLAT)
+    snap = np.array([last.get(tf, nan_row)[[I_CLOSE, I_EMA50, I_EMA200]]
+                     for tf in TREND_TFS])
+    trend_D1, trend_H4, trend_H1, trend_M15 = detect_trends(snap)
 
     trends_str = f"D1={trend_D1} | H4={trend_H4} | H1={trend_H1} | M15={trend_M15}"
 
     # Preisinfos (best effort)
-    close = to_float(last.get("1h", last[list(last.keys())[0]])["Close"])
-    d1 = frames.get("1d")
-    day_high = to_float(d1["High"].iloc[-1]) if d1 is not None else np.nan
-    day_low  = to_float(d1["Low"].iloc[-1])  if d1 is not None else np.nan
+    close = last.get("1h", next(iter(last.values())))[I_CLOSE]
+    d1 = last.get("1d", nan_row)
+    day_high = d1[I_HIGH]
+    day_low  = d1[I_LOW]
 
     payload = {
         "TYPE": "ANALYSE",
@@ -215,18 +682,27 @@ def analyze_symbol(symbol: str) -> Dict[str, str]:
         "Kurs": f"{close:.5f}" if not np.isnan(close) else "nan",
         "Tag_Hoch": f"{day_high:.5f}" if not np.isnan(day_high) else "nan",
         "Tag_Tief": f"{day_low:.5f}" if not np.isnan(day_low) else "nan",
-        "ZeitUTC": utc_now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ZeitUTC": now_str,
         "Hinweis": "Einzelne TF evtl. übersprungen (Rate-Limit)."
     }
 
     return payload, frames
 
 
-def build_plots(symbol: str, frames: Dict[str, pd.DataFrame]) -> Dict[str, bytes]:
+PLOT_TFS = ("1h", "4h", "1d", "15m", "5m")
+
+def plot_frames(frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Nur was geplottet wird (Close der letzten 300 Bars) – klein genug zum Pickeln."""
+    return {k: frames[k][["Close"]].tail(300) for k in PLOT_TFS
+            if k in frames and not frames[k].empty}
+
+def build_plots(symbol: str, frames: Dict[str, pd.DataFrame],
+                fig: Figure | None = None) -> Dict[str, bytes]:
     imgs: Dict[str, bytes] = {}
-    for key, title in [("1h", "1h"), ("4h", "4h"), ("1d", "1d"), ("15m", "15m"), ("5m", "5m")]:
+    fig = fig or _mini_figure()
+    for key in PLOT_TFS:
         if key in frames and not frames[key].empty:
-            imgs[key] = mini_plot(frames[key].tail(300), f"{symbol} {title} – Close")
+            imgs[key] = mini_plot(frames[key].tail(300), f"{symbol} {key} – Close", fig)
     return imgs
 
 
@@ -238,36 +714,126 @@ def main():
     ap.add_argument("--symbols", default="EURUSD=X", help="Kommagetrennt, z. B. EURUSD=X,GBPUSD=X")
     ap.add_argument("--tz", default="Europe/Berlin")
     ap.add_argument("--email", action="store_true", help="E-Mail senden")
+    ap.add_argument("--force", action="store_true",
+                    help="Auch ohne neue M15-Bar analysieren (State ignorieren)")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="Download-Cache nicht lesen (alles frisch laden)")
     args = ap.parse_args()
+    read_cache = not args.no_cache
 
     symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
     all_ok = True
-
-    for sym in symbols:
-        print(f"[run] Starte Analyse für {sym}")
+    smtp = None  # bei mehreren Symbolen: eine Verbindung für alle Mails
+    fig = None   # eine Plot-Figure für alle Symbole
+    state = _state_load()
+    state_dirty = False
+    now = utc_now()  # ein Zeitstempel für den ganzen Lauf (ZeitUTC aller Symbole)
+
+    # FX-Wochenende: sind die letzten Bars vor Handelsschluss schon ausgewertet,
+    # kommt bis Sonntagabend nichts Neues – auch den Download sparen (ohne
+    # Symbole laufen Download/Analyse leer durch bis zum Abschluss)
+    if not args.force and _fx_weekend_done(symbols, state, now):
+        print("[run] FX-Wochenende, letzte Bars bereits ausgewertet – nichts zu tun.")
+        symbols = []
+
+    # Mehrere Symbole: D1 + Intraday-Basis je Intervall gesammelt vorladen
+    periods = dict(TIMEFRAMES)
+    for interval, period in (("1d", periods["1d"]), (BASE_INTERVAL, BASE_PERIOD)):
+        prefetch(symbols, interval, period, read_cache=read_cache)
+
+    # Analysen (I/O-gebunden) parallel; Plots + Versand in Symbol-Reihenfolge,
+    # sobald das jeweilige Symbol fertig ist – die übrigen laden derweil weiter.
+    # Die geteilte SMTP-Verbindung (TLS + Login) wird mit dem ersten Ergebnis
+    # parallel zu dessen Plots aufgebaut (Läufe ohne neue Bar verbinden nicht).
+    workers = max(1, min(len(symbols), MAX_SYMBOL_WORKERS))
+    share_smtp = args.email and len(symbols) > 1
+    smtp_future = None
+
+    # Viele Symbole: Charts je Symbol direkt nach der Analyse in einem
+    # Prozesspool rendern (spawn – kein fork aus laufenden Download-Threads).
+    # Der Pool hängt am with unten: die Worker enden auch, wenn etwas aus dem
+    # Versand-Loop entkommt (KeyboardInterrupt, smtp_future.result(), ...).
+    cpus = os.cpu_count() or 1
+    use_procs = len(symbols) >= PLOT_PROCS_MIN_SYMBOLS and cpus > 1
+    plot_pool: ProcessPoolExecutor | None = None
+
+    def analyze(sym: str):
+        result = analyze_symbol(sym, None if args.force else state.get(sym), now, read_cache)
+        if plot_pool is not None and isinstance(result, tuple):
+            payload, frames = result
+            return payload, frames, plot_pool.submit(build_plots, sym, plot_frames(frames))
+        return result
+
+    with (ProcessPoolExecutor(max_workers=min(len(symbols), cpus),
+                              mp_context=mp.get_context("spawn"))
+          if use_procs else contextlib.nullcontext()) as plot_pool, \
+         ThreadPoolExecutor(max_workers=workers + share_smtp) as ex:
+        futures = {}
+        for sym in symbols:
+            print(f"[run] Starte Analyse für {sym}")
+            futures[sym] = ex.submit(analyze, sym)
+
+        for sym in symbols:
+            try:
+                result = futures[sym].result()
+                if result is None:
+                    print(f"[run] {sym}: keine neue M15-Bar – übersprungen")
+                    continue
+                if share_smtp:
+                    smtp_future, share_smtp = ex.submit(smtp_connect), False
+                stamp = None
+                if isinstance(result, dict):
+                    # nur Payload (kein Frame verfügbar)
+                    payload = result
+                    imgs = {}
+                else:
+                    payload, frames, *plotted = result
+                    stamp = _m15_stamp(frames)
+                    if plotted:
+                        imgs = plotted[0].result()
+                    else:
+                        if fig is None:
+                            fig = _mini_figure()
+                        imgs = build_plots(sym, frames, fig)
+
+                subject = f"{sym} – Analyse {payload.get('TYPE','')}: {payload.get('Zeitebenen','')} | {payload.get('ZeitUTC','')}"
+                body = format_block(payload)
+
+                if args.email:
+                    if smtp_future is not None:
+                        smtp, smtp_future = smtp_future.result(), None
+                    ok = send_email(subject, body, imgs, conn=smtp)
+                    if smtp is not None and smtp.sock is None:
+                        # getrennt (von send_email geschlossen): für die übrigen
+                        # Symbole neu verbinden statt die tote Verbindung zu nutzen
+                        smtp = smtp_connect()
+                    all_ok &= ok
+                else:
+                    ok = True
+                    print(body)
+
+                # nur nach erfolgreicher Ausgabe merken – fehlgeschlagene Mail wird
+                # im nächsten Lauf wiederholt
+                if ok and stamp is not None:
+                    state[sym] = stamp
+                    state_dirty = True
+
+            except Exception as e:
+                all_ok = False
+                print(f"[ERROR] {sym}: {e}")
+                traceback.print_exc()
+
+    if smtp_future is not None:  # aufgebaut, aber nicht mehr gebraucht -> unten schließen
+        smtp = smtp_future.result()
+
+    if state_dirty:
+        _state_store(state)
+
+    if smtp is not None:
         try:
-            result = analyze_symbol(sym)
-            if isinstance(result, dict):
-                # nur Payload (kein Frame verfügbar)
-                payload = result
-                imgs = {}
-            else:
-                payload, frames = result
-                imgs = build_plots(sym, frames)
-
-            subject = f"{sym} – Analyse {payload.get('TYPE','')}: {payload.get('Zeitebenen','')} | {payload.get('ZeitUTC','')}"
-            body = format_block(payload)
-
-            if args.email:
-                ok = send_email(subject, body, imgs)
-                all_ok &= ok
-            else:
-                print(body)
-
-        except Exception as e:
-            all_ok = False
-            print(f"[ERROR] {sym}: {e}")
-            traceback.print_exc()
+            smtp.quit()
+        except Exception:
+            pass
 
     if not all_ok:
         # Nicht hart fehlschlagen – Actions soll trotzdem „grün“ sein.
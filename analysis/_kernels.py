@@ -0,0 +1,306 @@
+# analysis/_kernels.py
+from __future__ import annotations
+
+import numpy as np
+
+from utils._njit import njit
+
+# fastmath ohne "nnan"/"ninf": NaN-Checks (x == x) müssen erhalten bleiben.
+# Die Wilder/EMA-Kernel sind dtype-generisch (float32 oder float64 rein/raus);
+# der Rekursionszustand läuft intern immer in float64.
+_FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
+# nogil: agent.py rechnet je Symbol in einem eigenen Thread – die Kernel geben
+# den GIL frei und laufen so auf mehreren Kernen parallel.
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _wilder_ewma(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Rekursive EWMA (wie pandas ewm(alpha=..., adjust=False).mean()).
+    NaN-Werte halten den letzten Stand, exakt mit pandas-Gewichtung.
+    """
+    n = x.shape[0]
+    out = np.empty_like(x)
+    s = np.nan
+    w = 1.0
+    seeded = False
+    for i in range(n):
+        xi = x[i]
+        if seeded:
+            w *= 1.0 - alpha
+            if xi == xi:
+                s = (w * s + alpha * xi) / (w + alpha)
+                w = 1.0
+        elif xi == xi:
+            s = xi
+            seeded = True
+        out[i] = s
+    return out
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _ta_core(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+             a_fast: float, a_slow: float, rsi_len: int, atr_len: int) -> np.ndarray:
+    """
+    EMA(fast/slow), RSI und ATR (Wilder, alpha=1/N) in einem einzigen Durchlauf.
+    Rückgabe: (N, 4)-Array [ema_fast, ema_slow, rsi, atr] im dtype von close.
+    EMA/ATR halten bei NaN den letzten Stand (pandas-Gewichtung wie _wilder_ewma),
+    Gain/Loss sind nie NaN (NaN-Diff zählt als 0), die True Range ignoriert
+    NaN-Komponenten wie pandas' max(axis=1).
+    """
+    n = close.shape[0]
+    out = np.empty((n, 4), dtype=close.dtype)
+    if n == 0:
+        return out
+
+    a_rsi = 1.0 / rsi_len
+    a_atr = 1.0 / atr_len
+
+    sf = np.nan
+    ss = np.nan
+    wf = 1.0
+    ws = 1.0
+    ema_seeded = False
+
+    up = 0.0
+    down = 0.0
+
+    s_atr = np.nan
+    w_atr = 1.0
+    atr_seeded = False
+
+    for i in range(n):
+        xi = close[i]
+
+        # --- EMA fast/slow
+        if ema_seeded:
+            wf *= 1.0 - a_fast
+            ws *= 1.0 - a_slow
+            if xi == xi:
+                sf = (wf * sf + a_fast * xi) / (wf + a_fast)
+                ss = (ws * ss + a_slow * xi) / (ws + a_slow)
+                wf = 1.0
+                ws = 1.0
+        elif xi == xi:
+            sf = xi
+            ss = xi
+            ema_seeded = True
+        out[i, 0] = sf
+        out[i, 1] = ss
+
+        # --- RSI
+        if i > 0:
+            d = xi - close[i - 1]
+            g = d if d > 0 else 0.0
+            l = -d if d < 0 else 0.0
+            up = up + a_rsi * (g - up)
+            down = down + a_rsi * (l - down)
+            out[i, 2] = 100.0 - 100.0 / (1.0 + up / down) if down != 0 else np.nan
+        else:
+            out[i, 2] = np.nan
+
+        # --- True Range (NaN-tolerant)
+        tr = high[i] - low[i]
+        if i > 0:
+            pc = close[i - 1]
+            hc = abs(high[i] - pc)
+            lc = abs(low[i] - pc)
+            if hc > tr or tr != tr:
+                tr = hc
+            if lc > tr or tr != tr:
+                tr = lc
+
+        # --- ATR (Wilder-EWMA)
+        if atr_seeded:
+            w_atr *= 1.0 - a_atr
+            if tr == tr:
+                s_atr = (w_atr * s_atr + a_atr * tr) / (w_atr + a_atr)
+                w_atr = 1.0
+        elif tr == tr:
+            s_atr = tr
+            atr_seeded = True
+        out[i, 3] = s_atr
+
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_extreme_shift1(x: np.ndarray, w: int, is_max: bool) -> np.ndarray:
+    """
+    Gleitendes Max/Min über die w Werte VOR i (entspricht
+    x.shift(1).rolling(w).max()/min()), O(N) per monotoner Deque.
+    NaN im Fenster -> NaN (wie pandas mit min_periods=w).
+    """
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if w <= 0:
+        return out
+    dq = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    last_nan = -1
+    for i in range(n):
+        if i >= w:
+            while head < tail and dq[head] < i - w:
+                head += 1
+            if last_nan < i - w and head < tail:
+                out[i] = x[dq[head]]
+        xi = x[i]
+        if xi != xi:
+            last_nan = i
+            continue
+        if is_max:
+            while tail > head and x[dq[tail - 1]] <= xi:
+                tail -= 1
+        else:
+            while tail > head and x[dq[tail - 1]] >= xi:
+                tail -= 1
+        dq[tail] = i
+        tail += 1
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_max_shift1(x: np.ndarray, w: int) -> np.ndarray:
+    return _rolling_extreme_shift1(x, w, True)
+
+
+@njit(cache=True, nogil=True)
+def _rolling_min_shift1(x: np.ndarray, w: int) -> np.ndarray:
+    return _rolling_extreme_shift1(x, w, False)
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _ema(x: np.ndarray, length: int) -> np.ndarray:
+    """EMA (alpha=2/(N+1), adjust=False); die ersten N-1 Werte sind Warm-up (NaN)."""
+    out = _wilder_ewma(x, 2.0 / (length + 1))
+    out[:min(length - 1, out.shape[0])] = np.nan
+    return out
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _ewma_step(s: float, w: float, seeded: bool, x: float, alpha: float):
+    """Ein Schritt von _wilder_ewma (pandas adjust=False inkl. NaN-Gewichtung)."""
+    if seeded:
+        w *= 1.0 - alpha
+        if x == x:
+            s = (w * s + alpha * x) / (w + alpha)
+            w = 1.0
+    elif x == x:
+        s = x
+        seeded = True
+    return s, w, seeded
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _adx_rsi_psar(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int,
+                  rsi_len: int = 14, af0: float = 0.02, max_af: float = 0.2):
+    """
+    ATR, +DI, -DI, ADX (Wilder, alpha=1/N), RSI (Wilder-RMA, 100*up/(up+down))
+    und Parabolic SAR in einem Durchlauf; die True Range wird einmal berechnet
+    und für ATR und DI geteilt. Liefert (atr, dmp, dmn, adx, rsi, psar); Warm-up-Bereiche von
+    DI/ADX/RSI sind NaN.
+    """
+    n = close.shape[0]
+    atr = np.empty_like(close)
+    dmp = np.empty_like(close)
+    dmn = np.empty_like(close)
+    adx = np.empty_like(close)
+    rsi = np.empty_like(close)
+    psar = np.empty_like(close)
+    if n == 0:
+        return atr, dmp, dmn, adx, rsi, psar
+
+    a = 1.0 / length
+    a_rsi = 1.0 / rsi_len
+    avg_g = 0.0
+    avg_l = 0.0
+    s_tr, w_tr, k_tr = np.nan, 1.0, False
+    s_p, w_p, k_p = np.nan, 1.0, False
+    s_n, w_n, k_n = np.nan, 1.0, False
+    s_x, w_x, k_x = np.nan, 1.0, False
+
+    # PSAR-Start: fallend, wenn Bar 1 stärker nach unten als nach oben ausbricht
+    falling = n > 1 and (low[0] - low[1]) > max(high[1] - high[0], 0.0)
+    sar = high[0] if falling else low[0]
+    ep = low[0] if falling else high[0]
+    af = af0
+    psar[0] = np.nan
+
+    for i in range(n):
+        h = high[i]
+        l = low[i]
+
+        # --- True Range (NaN-tolerant) + Directional Movement + Gain/Loss
+        tr = h - l
+        pos = 0.0
+        neg = 0.0
+        if i > 0:
+            pc = close[i - 1]
+            d = close[i] - pc   # NaN-Diff zählt als 0
+            avg_g += a_rsi * ((d if d > 0 else 0.0) - avg_g)
+            avg_l += a_rsi * ((-d if d < 0 else 0.0) - avg_l)
+            hc = abs(h - pc)
+            lc = abs(l - pc)
+            if hc > tr or tr != tr:
+                tr = hc
+            if lc > tr or tr != tr:
+                tr = lc
+            up = h - high[i - 1]
+            dn = low[i - 1] - l
+            if up > dn and up > 0:
+                pos = up
+            if dn > up and dn > 0:
+                neg = dn
+
+        # --- Wilder-Glättung
+        s_tr, w_tr, k_tr = _ewma_step(s_tr, w_tr, k_tr, tr, a)
+        s_p, w_p, k_p = _ewma_step(s_p, w_p, k_p, pos, a)
+        s_n, w_n, k_n = _ewma_step(s_n, w_n, k_n, neg, a)
+        atr[i] = s_tr
+
+        if i >= length and s_tr > 0:
+            dmp[i] = 100.0 * s_p / s_tr
+            dmn[i] = 100.0 * s_n / s_tr
+        else:
+            dmp[i] = np.nan
+            dmn[i] = np.nan
+        sd = dmp[i] + dmn[i]
+        dx = 100.0 * abs(dmp[i] - dmn[i]) / sd if sd > 0 else np.nan
+        s_x, w_x, k_x = _ewma_step(s_x, w_x, k_x, dx, a)
+        adx[i] = s_x if i >= 2 * length - 1 else np.nan
+        s = avg_g + avg_l
+        rsi[i] = 100.0 * avg_g / s if (i >= rsi_len and s != 0) else np.nan
+
+        # --- Parabolic SAR
+        if i == 0:
+            continue
+        if h != h or l != l:
+            psar[i] = np.nan
+            continue
+        nxt = sar + af * (ep - sar)
+        if falling:
+            reverse = h > nxt
+            if l < ep:
+                ep = l
+                af = min(af + af0, max_af)
+            nxt = max(nxt, high[i - 1])
+            if i > 1:
+                nxt = max(nxt, high[i - 2])
+        else:
+            reverse = l < nxt
+            if h > ep:
+                ep = h
+                af = min(af + af0, max_af)
+            nxt = min(nxt, low[i - 1])
+            if i > 1:
+                nxt = min(nxt, low[i - 2])
+        if reverse:
+            nxt = ep
+            af = af0
+            falling = not falling
+            ep = l if falling else h
+        sar = nxt
+        psar[i] = sar
+
+    return atr, dmp, dmn, adx, rsi, psar
@@ -2,22 +2,42 @@
 from __future__ import annotations
 import os
 from pathlib import Path
-from zoneinfo import ZoneInfo
-import matplotlib.pyplot as plt
+from functools import lru_cache
+from typing import TYPE_CHECKING
 import pandas as pd
 
+from utils.helpers import _zi, decimate
+
+if TYPE_CHECKING:
+    # matplotlib erst beim ersten Chart laden (Import ~0.35 s)
+    from matplotlib.figure import Figure
+
 def _ensure_dir(p: str | Path) -> None:
     Path(p).parent.mkdir(parents=True, exist_ok=True)
 
+@lru_cache(maxsize=4)
+def _figure(figsize: tuple) -> Figure:
+    """Eine Agg-Figure je Größe, über Aufrufe/Symbole wiederverwendet (ohne pyplot)."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _fresh_axes(figsize: tuple):
+    fig = _figure(figsize)
+    fig.clear()
+    return fig, fig.add_subplot(111)
+
 def _dummy_chart(path: str | Path, title: str, message: str) -> str:
     _ensure_dir(path)
-    fig, ax = plt.subplots(figsize=(10, 4))
+    fig, ax = _fresh_axes((10, 4))
     ax.axis("off")
     ax.text(0.5, 0.65, title, ha="center", va="center", fontsize=13, wrap=True)
     ax.text(0.5, 0.35, message, ha="center", va="center", fontsize=11, wrap=True)
     fig.tight_layout()
-    fig.savefig(path, dpi=140, bbox_inches="tight")
-    plt.close(fig)
+    fig.savefig(path, dpi=100, bbox_inches="tight")
     return str(path)
 
 def plot_m15(df: pd.DataFrame, symbol: str, tz: str, out_dir: str) -> str:
@@ -30,26 +50,29 @@ def plot_m15(df: pd.DataFrame, symbol: str, tz: str, out_dir: str) -> str:
     ts_str = "n/a"
     try:
         if df is not None and len(df) > 0:
-            last_dt = df.index[-1]
-            if getattr(last_dt, "tzinfo", None) is None:
-                last_dt = pd.Timestamp(last_dt, tz="UTC")
-            ts_str = last_dt.astimezone(ZoneInfo(tz)).strftime("%Y-%m-%d %H:%M")
+            # index.values liefert UTC (naive Indizes gelten als UTC) – ohne
+            # Timestamp-Umweg über index[-1]
+            last_dt = pd.Timestamp(df.index.values[-1], tz="UTC")
+            ts_str = last_dt.tz_convert(_zi(tz)).strftime("%Y-%m-%d %H:%M")
     except Exception:
         ts_str = "n/a"
 
     title = f"{symbol} – M15 ({ts_str} {tz})"
 
     # Kein DataFrame / leer → Dummy-PNG
-    if df is None or len(df) == 0 or "Close" not in df.columns or df["Close"].dropna().empty:
+    if df is None or len(df) == 0 or "Close" not in df.columns or df["Close"].isna().all():
         return _dummy_chart(out_path, title, "Keine M15-Daten verfügbar (Rate-Limit / leerer Download).")
 
     # Echte einfache Linie (robust, ohne mplfinance-Abhängigkeit)
-    fig, ax = plt.subplots(figsize=(10, 5))
-    df["Close"].plot(ax=ax)
+    fig, ax = _fresh_axes((10, 5))
+    # ~1 Punkt je 2px bei 1000px Breite; direkt ax.plot statt Series.plot
+    # (spart pandas' Plot-Wrapper samt Datums-Konverter)
+    close = decimate(df["Close"], 500)
+    ax.plot(close.index, close.to_numpy(), linewidth=0.8)
+    fig.autofmt_xdate()
     ax.set_title(title)
     ax.set_xlabel("Zeit")
     ax.set_ylabel("Preis")
     fig.tight_layout()
-    fig.savefig(out_path, dpi=140, bbox_inches="tight")
-    plt.close(fig)
+    fig.savefig(out_path, dpi=100, bbox_inches="tight")
     return out_path
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
 import yfinance as yf
 
@@ -9,6 +10,11 @@ def load_yf(symbol: str, interval: str, period: str) -> pd.DataFrame:
     df = df.rename(columns=str.title)  # Open, High, Low, Close, Volume
     return df.dropna()
 
-def resample_ohlc(df_15m: pd.DataFrame, rule: str) -> pd.DataFrame:
+def resample_ohlc(df_15m: pd.DataFrame, rule: str, label: str = "right", closed: str = "right") -> pd.DataFrame:
+    # Yahoo-Bars sind mit ihrem Startzeitpunkt gelabelt -> dafür label/closed="left"
     agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
-    return df_15m.resample(rule, label="right", closed="right").agg(agg).dropna()
+    r = df_15m.resample(rule, label=label, closed=closed)
+    # je Spalte die Reduktion direkt (spart den agg-Dispatch); Bins mit NaN
+    # (Lücken, Wochenende) raus wie dropna(), aber über einen Array-Scan
+    out = pd.DataFrame({k: getattr(r[k], how)() for k, how in agg.items() if k in df_15m.columns})
+    return out[~np.isnan(out.to_numpy(dtype=np.float64)).any(axis=1)]
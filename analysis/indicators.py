@@ -4,19 +4,84 @@ from __future__ import annotations
 from typing import Optional
 import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
+from utils._njit import NUMBA_AVAILABLE, aot_kernels_current
 
-def _pick_column(df: pd.DataFrame, *candidates: str) -> pd.Series:
-    """Nimmt die erste passende Spalte – tolerant ggü. leicht anderen Namen."""
+try:
+    # AOT-kompiliert (python build_kernels.py) – kein JIT beim ersten Aufruf
+    if not aot_kernels_current():
+        raise ImportError("ta_kernels fehlt oder ist veraltet")
+    from ta_kernels import adx_rsi_psar as _adx_rsi_psar, ema as _ema
+    FAST_KERNELS = True
+except ImportError:
+    from analysis._kernels import _adx_rsi_psar, _ema
+    FAST_KERNELS = NUMBA_AVAILABLE
+
+# EMA im Kernel-Pfad auf float32 (halbe Bandbreite, Zustand intern float64).
+# ADX/DMI/PSAR bleiben float64: deren Vergleiche (+DM vs. -DM, SAR-Umkehr)
+# kippen sonst bei knappen Bars; RSI läuft im selben float64-Durchlauf mit.
+IND_DTYPE = np.float32
+
+try:
+    import pandas_ta as ta  # optional: Fallback ohne Numba + PSAR
+except Exception:
+    ta = None
+
+try:
+    from scipy.signal import lfilter  # optional: Wilder-RMA als IIR-Filter
+except Exception:
+    lfilter = None
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """
+    True Range auf float64-Arrays, in-place über drei Puffer. fmax ignoriert
+    NaN-Komponenten wie pandas' max(axis=1) (erste Bar: High-Low).
+    """
+    pc = np.empty_like(close)
+    pc[0] = np.nan
+    pc[1:] = close[:-1]
+    tr = np.abs(high - low)
+    hc = np.abs(high - pc)
+    np.fmax(tr, hc, out=tr)
+    np.subtract(low, pc, out=pc)
+    np.fmax(tr, np.abs(pc, out=pc), out=tr)
+    return tr
+
+
+def _rma(x: np.ndarray, length: int) -> np.ndarray:
+    """Wilder-RMA (alpha=1/N, adjust=False); lfilter nur auf NaN-freien Arrays."""
+    a = 1.0 / length
+    if lfilter is not None and not np.isnan(x).any():
+        return lfilter([a], [1.0, a - 1.0], x, zi=[x[0] * (1.0 - a)])[0]
+    return pd.Series(x).ewm(alpha=a, adjust=False).mean().to_numpy()
+
+
+def _rsi_np(close: np.ndarray, length: int) -> np.ndarray:
+    """Wilder-RSI wie in _adx_rsi_psar, aber vektorisiert: ein diff, zwei RMA-Pässe."""
+    d = np.diff(close, prepend=np.nan)
+    up = _rma(np.fmax(d, 0.0), length)   # NaN-Diff -> 0
+    dn = _rma(np.fmax(-d, 0.0), length)
+    s = up + dn
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(s != 0, 100.0 * up / s, np.nan)
+    rsi[:length] = np.nan
+    return rsi
+
+
+def _pick_column(df: pd.DataFrame, upcols: dict, *candidates: str) -> pd.Series:
+    """
+    Nimmt die erste passende Spalte – tolerant ggü. leicht anderen Namen.
+    `upcols` ({NAME.upper(): Name}) baut der Aufrufer einmal je Frame.
+    """
     if df is None or df.empty:
         return pd.Series(np.nan, index=pd.RangeIndex(0))
-    # 1) exakter Treffer
+    # 1) exakter Treffer (Dict-Lookup statt Spalten-Scan)
     for c in candidates:
-        if c in df.columns:
-            return df[c]
+        real = upcols.get(c.upper())
+        if real is not None:
+            return df[real]
     # 2) fuzzy: startswith / enthält
-    upcols = {c.upper(): c for c in df.columns}
     for want in candidates:
         w = want.upper().replace("+", "P").replace("-", "M")
         for up, real in upcols.items():
@@ -26,23 +91,36 @@ def _pick_column(df: pd.DataFrame, *candidates: str) -> pd.Series:
     return df[df.columns[0]]
 
 
+def _attach(df: pd.DataFrame, cols: dict) -> pd.DataFrame:
+    """
+    Neue Spalten als ein Block anhängen statt df.copy() + Einzel-Inserts; die
+    OHLC-Blöcke des Aufrufers werden geteilt, nicht kopiert. Bereits vorhandene
+    gleichnamige Spalten werden ersetzt (wie bei df[c] = ...).
+    """
+    old = [c for c in cols if c in df.columns]
+    if old:
+        df = df.drop(columns=old)
+    return pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1, copy=False)
+
+
 def _normalize_adx(adx_df: pd.DataFrame) -> pd.DataFrame:
     """Bringt ADX/DMP/DMM auf ein einheitliches Schema."""
     out = pd.DataFrame(index=adx_df.index)
+    upcols = {c.upper(): c for c in adx_df.columns}
 
     # ADX
     out["ADX"] = _pick_column(
-        adx_df, "ADX_14", "ADX14", "ADX"
+        adx_df, upcols, "ADX_14", "ADX14", "ADX"
     )
 
     # +DI (DMP)
     out["DMP"] = _pick_column(
-        adx_df, "DMP_14", "DMP14", "DM+_14", "PLUS_DI_14", "PDI_14", "PDI"
+        adx_df, upcols, "DMP_14", "DMP14", "DM+_14", "PLUS_DI_14", "PDI_14", "PDI"
     )
 
     # -DI (DMM)
     out["DMM"] = _pick_column(
-        adx_df, "DMM_14", "DMM14", "DM-_14", "MINUS_DI_14", "MDI_14", "MDI"
+        adx_df, upcols, "DMM_14", "DMM14", "DM-_14", "MINUS_DI_14", "MDI_14", "MDI"
     )
 
     return out
@@ -54,14 +132,21 @@ def add_indicators(
     rsi_len: int = 14,
     ema_len: int = 50,
     psar: bool = False,
+    psar_af: float = 0.02,
+    psar_max_af: float = 0.2,
 ) -> pd.DataFrame:
     """
     Fügt (robust) Wilder-Indikatoren hinzu:
       - ADX/DMI  -> Spalten: ADX, DMP, DMM
+      - ATR      -> Spalte:  ATR (adx_len)
       - RSI      -> Spalte:  RSI
       - EMA      -> Spalte:  EMA_{ema_len}
-      - PSAR     -> optional Spalte: PSAR
+      - PSAR     -> optional Spalte: PSAR (Start-/Schritt-AF psar_af, max. psar_max_af)
     Fällt bei Datenproblemen auf NaN zurück (kein Traceback).
+    ATR/ADX/RSI/PSAR laufen in einem Kernel-Durchlauf (_adx_rsi_psar), EMA über
+    _ema (analysis/_kernels.py). pandas_ta wird nur ohne Numba
+    (falls installiert) für ADX/EMA/PSAR genutzt; RSI/ATR laufen dann
+    vektorisiert (_rsi_np, _rma).
     """
     if df is None or df.empty:
         return df
@@ -71,6 +156,33 @@ def add_indicators(
         # Nichts kaputt machen, aber sauber zurückgeben
         return df.copy()
 
+    # OHLC einmal als float64-Arrays (ohne Kopie, wenn schon float64) – beide
+    # Pfade rechnen darauf statt auf Series
+    high = df["High"].to_numpy(dtype=np.float64, copy=False)
+    low = df["Low"].to_numpy(dtype=np.float64, copy=False)
+    close = df["Close"].to_numpy(dtype=np.float64, copy=False)
+
+    if FAST_KERNELS or ta is None:
+        # Ergebnisse sammeln und einmal anhängen (_attach) – kein df.copy()
+        cols = {}
+        try:
+            atr, dmp, dmn, adx, rsi, sar = _adx_rsi_psar(high, low, close, adx_len,
+                                                         rsi_len, psar_af, psar_max_af)
+            cols.update(ADX=adx, DMP=dmp, DMM=dmn, ATR=atr)
+            if psar:
+                cols["PSAR"] = sar
+            # ohne Numba ist der Kernel eine Python-Schleife -> RSI vektorisiert
+            cols["RSI"] = rsi if FAST_KERNELS else _rsi_np(close, rsi_len)
+        except Exception:
+            cols.update(ADX=np.nan, DMP=np.nan, DMM=np.nan, ATR=np.nan, RSI=np.nan)
+            if psar:
+                cols["PSAR"] = np.nan
+        try:
+            cols[f"EMA_{ema_len}"] = _ema(close.astype(IND_DTYPE), ema_len)
+        except Exception:
+            cols[f"EMA_{ema_len}"] = np.nan
+        return _attach(df, cols)
+
     df = df.copy()
 
     # --- ADX/DMI ---
@@ -87,30 +199,50 @@ def add_indicators(
     except Exception:
         df[["ADX", "DMP", "DMM"]] = np.nan
 
-    # --- RSI ---
+    # --- ATR (True Range auf den Arrays, Wilder-RMA) ---
     try:
-        df["RSI"] = pd.to_numeric(ta.rsi(df["Close"], length=rsi_len), errors="coerce")
+        df["ATR"] = _rma(true_range(high, low, close), adx_len)
+    except Exception:
+        df["ATR"] = np.nan
+
+    # --- RSI (direkt auf dem Array statt ta.rsi) ---
+    try:
+        df["RSI"] = _rsi_np(close, rsi_len)
     except Exception:
         df["RSI"] = np.nan
 
     # --- EMA ---
     ema_col = f"EMA_{ema_len}"
     try:
-        df[ema_col] = pd.to_numeric(ta.ema(df["Close"], length=ema_len), errors="coerce")
+        # ta.ema liefert bereits float64 (Close ist numerisch) – kein to_numeric
+        ema = ta.ema(df["Close"], length=ema_len)
+        df[ema_col] = np.nan if ema is None else ema
     except Exception:
         df[ema_col] = np.nan
 
     # --- PSAR (optional) ---
     if psar:
-        try:
-            psar_df = ta.psar(high=df["High"], low=df["Low"], close=df["Close"])
-            if psar_df is not None and not psar_df.empty:
-                # nimm irgendeine „PSAR*“-Spalte (bull/bear Variants je nach Version)
+        _add_psar(df, psar_af, psar_max_af)
+
+    return df
+
+
+def _add_psar(df: pd.DataFrame, af: float = 0.02, max_af: float = 0.2) -> None:
+    """PSAR via pandas_ta (in-place); ohne pandas_ta -> NaN."""
+    try:
+        psar_df = ta.psar(high=df["High"], low=df["Low"], close=df["Close"],
+                          af0=af, af=af, max_af=max_af)
+        if psar_df is not None and not psar_df.empty:
+            # Long-/Short-Spalten (PSARl_*/PSARs_*) sind komplementär NaN -> in
+            # einem NumPy-Durchgang zusammenführen; sonst irgendeine „PSAR*“-Spalte
+            ls = [c for c in psar_df.columns if c.upper().startswith(("PSARL", "PSARS"))]
+            if len(ls) == 2:
+                mat = psar_df[ls].to_numpy(dtype=np.float64)
+                df["PSAR"] = np.where(np.isnan(mat[:, 0]), mat[:, 1], mat[:, 0])
+            else:
                 col = next((c for c in psar_df.columns if "PSAR" in c.upper()), psar_df.columns[-1])
                 df["PSAR"] = pd.to_numeric(psar_df[col], errors="coerce")
-            else:
-                df["PSAR"] = np.nan
-        except Exception:
+        else:
             df["PSAR"] = np.nan
-
-    return df
+    except Exception:
+        df["PSAR"] = np.nan
@@ -1,27 +1,31 @@
 # analysis/regime.py
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+from typing import List, NamedTuple, Optional, Tuple
 import pandas as pd
 import numpy as np
 
 
+class Regime(NamedTuple):
+    """Markt-Bias + Gründe; _asdict() liefert das frühere Dict-Format."""
+    bias: str
+    reasons: List[str]
+
+
 # ------------------------------------------------------------
 # Hilfen
 # ------------------------------------------------------------
-def _last(df: pd.DataFrame, col: str, label: Optional[str] = None):
-    """
-    Sicheres Last: gibt den letzten Wert einer Spalte zurück
-    (oder None, falls Spalte fehlt / leer / NaN).
-    """
-    if df is None or not isinstance(df, pd.DataFrame) or df.empty:
-        return None
-    if col not in df.columns:
-        return None
-    v = df[col].iloc[-1]
-    if pd.isna(v):
-        return None
-    return v
+def _last_row(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    """Letzte Zeile der Spalten `cols` als float64-Array (ein positionaler Zugriff)."""
+    return df.iloc[-1, df.columns.get_indexer(cols)].to_numpy(dtype=np.float64)
+
+
+def _ols_slope(y: np.ndarray, x: Optional[np.ndarray] = None) -> float:
+    """Steigung der Regressionsgeraden durch (x, y), geschlossene Form (x default 0..n-1)."""
+    if x is None:
+        x = np.arange(y.shape[0], dtype=np.float64)
+    xc = x - x.mean()
+    return float(xc @ (y - y.mean()) / (xc @ xc))
 
 
 def _has_cols(df: pd.DataFrame, cols: List[str]) -> bool:
@@ -30,25 +34,17 @@ def _has_cols(df: pd.DataFrame, cols: List[str]) -> bool:
     return all(c in df.columns for c in cols)
 
 
-def _nan_or_none(*vals) -> bool:
-    for v in vals:
-        if v is None:
-            return True
-        if isinstance(v, (float, int)) and pd.isna(v):
-            return True
-    return False
-
-
 # ------------------------------------------------------------
 # Kern: Regime-Ermittlung
 # ------------------------------------------------------------
-def regime_signal(d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame) -> Dict[str, object]:
+def regime_signal(d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame,
+                  adx_min: float = 0.0, ema50_slope_lookback: int = 50) -> Regime:
     """
     Liefert Markt-Bias (UP/DOWN/NEUTRAL) + Gründe (Liste).
     Erwartete Spalten (wenn vorhanden):
       - Close, EMA200 auf D1
-      - ADX, +DI, -DI auf H4
-      - EMA50 auf H1 (zur groben Steigung)
+      - ADX, +DI, -DI auf H4 (Richtung zählt erst ab ADX >= adx_min)
+      - EMA50 auf H1 (Steigung über die letzten ema50_slope_lookback Bars, min. 5)
     Funktion ist robust: Fehlen Spalten/Werte -> NEUTRAL mit Begründung.
     """
     reasons: List[str] = []
@@ -56,82 +52,93 @@ def regime_signal(d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame) -> Dict[
     # --- D1: Trendfilter via EMA200
     need_d1 = ["Close", "EMA200"]
     if not _has_cols(d1, need_d1):
-        return {"bias": "NEUTRAL", "reasons": ["D1: benötigte Spalten fehlen (Close/EMA200)."]}
+        return Regime("NEUTRAL", ["D1: benötigte Spalten fehlen (Close/EMA200)."])
 
-    d1_close = _last(d1, "Close")
-    d1_ema200 = _last(d1, "EMA200")
+    d1_close, d1_ema200 = _last_row(d1, need_d1)
 
-    if _nan_or_none(d1_close, d1_ema200):
-        return {"bias": "NEUTRAL", "reasons": ["D1: Close/EMA200 nicht verfügbar (NaN/None)."]}
+    if np.isnan(d1_close) or np.isnan(d1_ema200):
+        return Regime("NEUTRAL", ["D1: Close/EMA200 nicht verfügbar (NaN/None)."])
 
     d1_up = d1_close > d1_ema200
     d1_dn = d1_close < d1_ema200
     reasons.append(f"D1 {'über' if d1_up else 'unter' if d1_dn else 'nahe'} EMA200")
 
     # --- H4: Momentum via ADX & DMI
+    if h4 is None or h4.empty:
+        return Regime("NEUTRAL", ["H4: ADX/DMI nicht verfügbar (keine Daten)."])
+
     # Erlaube unterschiedliche Spaltennamen (manche Libs nennen sie ADX_14, DMP_14/DMN_14).
     adx_col = next((c for c in ["ADX", "ADX_14", "ADX14"] if c in h4.columns), None)
     pdi_col = next((c for c in ["+DI", "DMP_14", "PLUS_DI", "PDI"] if c in h4.columns), None)
     ndi_col = next((c for c in ["-DI", "DMN_14", "MINUS_DI", "NDI"] if c in h4.columns), None)
 
     if not all([adx_col, pdi_col, ndi_col]):
-        return {"bias": "NEUTRAL", "reasons": ["H4: ADX/+DI/-DI Spalten fehlen."]}
+        return Regime("NEUTRAL", ["H4: ADX/+DI/-DI Spalten fehlen."])
+
+    h4_adx, h4_pdi, h4_ndi = _last_row(h4, [adx_col, pdi_col, ndi_col])
 
-    h4_adx = _last(h4, adx_col)
-    h4_pdi = _last(h4, pdi_col)
-    h4_ndi = _last(h4, ndi_col)
+    if np.isnan(h4_adx) or np.isnan(h4_pdi) or np.isnan(h4_ndi):
+        return Regime("NEUTRAL", ["H4: ADX/DMI nicht verfügbar (NaN/None)."])
 
-    if _nan_or_none(h4_adx, h4_pdi, h4_ndi):
-        return {"bias": "NEUTRAL", "reasons": ["H4: ADX/DMI nicht verfügbar (NaN/None)."]}
+    # Richtungs-Signal auf H4 (nur mit ausreichender Trendstärke):
+    h4_trend = h4_adx >= adx_min
+    h4_up = (h4_pdi > h4_ndi) and h4_trend
+    h4_dn = (h4_ndi > h4_pdi) and h4_trend
+    h4_txt = 'bullisch' if h4_up else 'bärisch' if h4_dn else 'uneindeutig' if h4_trend else 'zu schwach'
+    reasons.append(f"H4 DMI: {h4_txt} (ADX={h4_adx:.1f})")
 
-    # Richtungs-Signal auf H4:
-    h4_up = (h4_pdi > h4_ndi) and (h4_adx is not None)
-    h4_dn = (h4_ndi > h4_pdi) and (h4_adx is not None)
-    reasons.append(f"H4 DMI: {'bullisch' if h4_up else 'bärisch' if h4_dn else 'uneindeutig'} (ADX={h4_adx:.1f})")
+    # Early-out: passen D1 und H4 weder zu UP noch zu DOWN, bleibt es unabhängig
+    # von H1 NEUTRAL -> Steigungs-Regression sparen
+    if not (d1_up and h4_up) and not ((not d1_up) and h4_dn):
+        reasons.append("H1: nicht ausgewertet (D1/H4 uneinig)")
+        return Regime("NEUTRAL", reasons)
 
     # --- H1: EMA50 Steigung (grobe Tendenz)
     if "EMA50" not in h1.columns:
-        return {"bias": "NEUTRAL", "reasons": ["H1: EMA50 fehlt."]}
+        return Regime("NEUTRAL", ["H1: EMA50 fehlt."])
 
     # Regressions-Steigung auf die letzten N Punkte der EMA50
-    lookback = min(50, len(h1))
+    lookback = min(ema50_slope_lookback, len(h1))
     if lookback < 5:
-        return {"bias": "NEUTRAL", "reasons": ["H1: zu wenig Daten für EMA50-Steigung."]}
+        return Regime("NEUTRAL", ["H1: zu wenig Daten für EMA50-Steigung."])
 
-    ema50 = h1["EMA50"].tail(lookback).to_numpy(dtype=float)
+    ema50 = h1["EMA50"].to_numpy(dtype=np.float64)[-lookback:]
     if np.isnan(ema50).all():
-        return {"bias": "NEUTRAL", "reasons": ["H1: EMA50 komplett NaN."]}
+        return Regime("NEUTRAL", ["H1: EMA50 komplett NaN."])
 
-    x = np.arange(len(ema50), dtype=float)
     # robust gegen NaNs
     mask = ~np.isnan(ema50)
     if mask.sum() < 3:
-        return {"bias": "NEUTRAL", "reasons": ["H1: zu wenige gültige EMA50-Werte."]}
+        return Regime("NEUTRAL", ["H1: zu wenige gültige EMA50-Werte."])
 
-    slope = np.polyfit(x[mask], ema50[mask], 1)[0]
+    if mask.all():
+        slope = _ols_slope(ema50)
+    else:
+        slope = _ols_slope(ema50[mask], np.flatnonzero(mask).astype(np.float64))
     h1_up = slope > 0
     h1_dn = slope < 0
     reasons.append(f"H1 EMA50-Slope: {'steigend' if h1_up else 'fallend' if h1_dn else 'flach'}")
 
     # --- Entscheidung (Kombination)
     if d1_up and h4_up and h1_up:
-        return {"bias": "UP", "reasons": reasons}
+        return Regime("UP", reasons)
 
     if (not d1_up) and h4_dn and h1_dn:
-        return {"bias": "DOWN", "reasons": reasons}
+        return Regime("DOWN", reasons)
 
-    return {"bias": "NEUTRAL", "reasons": reasons}
+    return Regime("NEUTRAL", reasons)
 
 
 # ------------------------------------------------------------
 # Safe-Wrapper: bricht nicht hart, sondern liefert NEUTRAL
 # ------------------------------------------------------------
-def regime_signal_safe(d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame) -> Dict[str, object]:
+def regime_signal_safe(d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame,
+                       adx_min: float = 0.0, ema50_slope_lookback: int = 50) -> Regime:
     """
     Sichere Version: fängt alle Fehler intern ab und liefert NEUTRAL + Grund.
     (WICHTIG: Diese Funktion darf KEINEN Einrückungs-/Leer-Body haben!)
     """
     try:
-        return regime_signal(d1, h4, h1)
+        return regime_signal(d1, h4, h1, adx_min, ema50_slope_lookback)
     except Exception as e:
-        return {"bias": "NEUTRAL", "reasons": [f"Regime-Fehler: {e}"]}
+        return Regime("NEUTRAL", [f"Regime-Fehler: {e}"])
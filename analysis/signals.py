@@ -1,20 +1,35 @@
 from __future__ import annotations
+from typing import NamedTuple, Optional
 import numpy as np
 import pandas as pd
 
+_SIG_COLS = ["Close", "EMA50", "RSI", "ATR", "PSAR"]
+
+
+class Trade(NamedTuple):
+    """M15-Signal; _asdict() liefert das frühere Dict-Format."""
+    action: str = "WAIT"
+    note: str = "Kein Setup"
+    entry: Optional[float] = None
+    sl: Optional[float] = None
+    tp: Optional[float] = None
+
+
+_NO_SETUP = Trade()
+
+
 def entry_exit_on_m15(m15: pd.DataFrame, bias: str,
-                      pullback_atr_frac=0.25, sl_atr_mult=1.5, tp_atr_mult=2.0) -> dict:
-    out = {"action": "WAIT", "note": "Kein Setup", "entry": None, "sl": None, "tp": None}
+                      pullback_atr_frac=0.25, sl_atr_mult=1.5, tp_atr_mult=2.0) -> Trade:
     if len(m15) < 20:
-        out["note"] = "Zu wenige Bars"
-        return out
+        return Trade(note="Zu wenige Bars")
 
-    close = float(m15["Close"].iloc[-1])
-    ema50 = float(m15["EMA50"].iloc[-1])
-    rsi   = float(m15["RSI"].iloc[-1])
-    atr   = float(m15["ATR"].iloc[-1])
-    psar  = float(m15["PSAR"].iloc[-1])
-    prev_rsi = float(m15["RSI"].iloc[-2])
+    # letzte zwei Bars einmal als float64-Block (erst Zeilen, dann Spalten schneiden)
+    a = m15.iloc[-2:][_SIG_COLS].to_numpy(dtype=np.float64)
+    # Warm-up (NaN in Close/EMA50/RSI/ATR) kann kein Setup ergeben -> sofort raus
+    if np.isnan(a[1, :4]).any():
+        return _NO_SETUP
+    close, ema50, rsi, atr, psar = a[1].tolist()
+    prev_rsi = float(a[0, 2])
 
     pullback_ok = abs(close - ema50) <= pullback_atr_frac * atr
 
@@ -26,7 +41,7 @@ def entry_exit_on_m15(m15: pd.DataFrame, bias: str,
             tp    = round(entry + tp_atr_mult * atr, 5)
             note  = "UP-Bias Entry (RSI>50, Pullback, >EMA50)"
             if psar > close: note += " | Achtung: PSAR über Preis (möglicher Flip)."
-            return {"action":"BUY","note":note,"entry":entry,"sl":sl,"tp":tp}
+            return Trade("BUY", note, entry, sl, tp)
 
     if bias == "DOWN":
         crossed_dn = (prev_rsi >= 50) and (rsi < 50)
@@ -36,6 +51,47 @@ def entry_exit_on_m15(m15: pd.DataFrame, bias: str,
             tp    = round(entry - tp_atr_mult * atr, 5)
             note  = "DOWN-Bias Entry (RSI<50, Pullback, <EMA50)"
             if psar < close: note += " | Achtung: PSAR unter Preis (möglicher Flip)."
-            return {"action":"SELL","note":note,"entry":entry,"sl":sl,"tp":tp}
+            return Trade("SELL", note, entry, sl, tp)
+
+    return _NO_SETUP
+
+
+def entry_exit_on_m15_series(m15: pd.DataFrame, bias: str,
+                             pullback_atr_frac=0.25, sl_atr_mult=1.5,
+                             tp_atr_mult=2.0) -> dict:
+    """
+    entry_exit_on_m15 für jede Bar auf einmal (Backtests): dieselben Regeln als
+    NumPy-Masken über die ganze Serie statt einer Python-Schleife je Bar.
+    Liefert ein Dict gleich langer Arrays: action ("BUY"/"SELL"/"WAIT"),
+    entry/sl/tp (NaN ohne Setup). Die ersten 19 Bars sind immer WAIT.
+    """
+    n = len(m15)
+    # Spalten einzeln als zusammenhängende float64-Arrays: kein m15[_SIG_COLS]
+    # (Frame-Kopie über alle Blöcke, ~10x teurer) und keine Strided-Views für
+    # die elementweisen ufuncs
+    close, ema50, rsi, atr = (np.ascontiguousarray(m15[c].to_numpy(dtype=np.float64))
+                              for c in _SIG_COLS[:4])
+    prev_rsi = np.empty(n)
+    prev_rsi[:1] = np.nan
+    prev_rsi[1:] = rsi[:-1]
+
+    # verzweigungsfrei: Bedingungen als Masken, die Richtung als Vorzeichen
+    ok = np.abs(close - ema50) <= pullback_atr_frac * atr
+    ok[:19] = False
+    if bias == "UP":
+        ok &= (close > ema50) & (prev_rsi <= 50) & (rsi > 50)
+        sign, label = 1.0, "BUY"
+    elif bias == "DOWN":
+        ok &= (close < ema50) & (prev_rsi >= 50) & (rsi < 50)
+        sign, label = -1.0, "SELL"
+    else:
+        ok[:] = False
+        sign, label = 0.0, "WAIT"
 
-    return out
+    entry = np.where(ok, np.round(close, 5), np.nan)
+    return {
+        "action": np.where(ok, label, "WAIT"),
+        "entry": entry,
+        "sl": np.round(entry - sign * sl_atr_mult * atr, 5),
+        "tp": np.round(entry + sign * tp_atr_mult * atr, 5),
+    }
@@ -0,0 +1,37 @@
+# build_kernels.py
+"""
+AOT-Build der Indikator-Kernel (numba.pycc) -> ta_kernels.*.so im Repo-Root.
+
+Erspart dem Actions-Lauf das JIT-Kompilieren beim ersten Aufruf (kalter
+Runner, kein __pycache__). agent.py und analysis/indicators.py nutzen das
+Modul, wenn es importierbar ist und ta_kernels.sha256 zu den aktuellen Quellen
+passt, sonst die @njit-Kernel aus analysis/_kernels.py.
+
+Aufruf:  python build_kernels.py
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+from analysis._kernels import _adx_rsi_psar, _ema, _ta_core
+from utils._njit import AOT_STAMP, kernel_source_hash
+
+cc = CC("ta_kernels")
+cc.output_dir = str(Path(__file__).resolve().parent)
+cc.verbose = False
+
+# agent.py: passend zu agent.IND_DTYPE (float32-Arrays, float64-Alphas)
+cc.export("ta_core", "f4[:, :](f4[:], f4[:], f4[:], f8, f8, i8, i8)")(_ta_core.py_func)
+
+# analysis/indicators.py: EMA auf IND_DTYPE (float32), ADX/RSI/PSAR auf float64
+cc.export("ema", "f4[:](f4[:], i8)")(_ema.py_func)
+cc.export("adx_rsi_psar",
+          "UniTuple(f8[:], 6)(f8[:], f8[:], f8[:], i8, i8, f8, f8)")(_adx_rsi_psar.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
+    # Stempel: agent.py/indicators.py laden das .so nur bei passendem Hash
+    AOT_STAMP.write_text(kernel_source_hash() + "\n")
+    print(f"[build] ta_kernels -> {cc.output_dir}")
@@ -8,20 +8,13 @@ def main():
     # .env im Projekt-Root laden
     load_dotenv(dotenv_path=".env")
 
-    print("===== ENV TEST =====")
-    print("EMAIL_TO =", os.getenv("EMAIL_TO", "NICHT GESETZT"))
-    print("SMTP_USER =", os.getenv("SMTP_USER", "NICHT GESETZT"))
-
-    pw = os.getenv("SMTP_PASS")
-    if pw:
-        print("SMTP_PASS =", pw[:4] + "******** (gesetzt)")
-    else:
-        print("SMTP_PASS = NICHT GESETZT")
-
-    print("SMTP_HOST =", os.getenv("SMTP_HOST", "NICHT GESETZT"))
-    print("SMTP_PORT =", os.getenv("SMTP_PORT", "NICHT GESETZT"))
-    print("TZ =", os.getenv("TZ", "NICHT GESETZT"))
-    print("====================")
+    # Ausgabe in einem Schreibvorgang statt neun print-Aufrufen
+    env = os.environ
+    pw = env.get("SMTP_PASS")
+    lines = [f"{k} = {env.get(k, 'NICHT GESETZT')}" for k in ("EMAIL_TO", "SMTP_USER")]
+    lines.append(f"SMTP_PASS = {pw[:4] + '******** (gesetzt)' if pw else 'NICHT GESETZT'}")
+    lines += [f"{k} = {env.get(k, 'NICHT GESETZT')}" for k in ("SMTP_HOST", "SMTP_PORT", "TZ")]
+    print("===== ENV TEST =====\n" + "\n".join(lines) + "\n====================")
 
 if __name__ == "__main__":
     main()
@@ -26,7 +26,7 @@ def main():
         with smtplib.SMTP("smtp.gmail.com", 587) as server:
             server.starttls(context=context)
             server.login(sender, password)
-            server.sendmail(sender, receiver, msg.as_string())
+            server.send_message(msg)  # Bytes-Serialisierung, kein as_string()-Umweg
 
         print("[OK] Testmail gesendet an", receiver)
 
@@ -1 +1,17 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from analysis._kernels import _rolling_max_shift1, _rolling_min_shift1
 
+BREAKOUT_BARS = 20
+
+def breakout_levels(df: pd.DataFrame, bars: int = BREAKOUT_BARS) -> pd.DataFrame:
+    """
+    Hoch/Tief der letzten `bars` Kerzen ohne die aktuelle
+    (= shift(1).rolling(bars).max/min) -> Spalten hh_{bars}, ll_{bars}.
+    """
+    if df is None or df.empty or not {"High", "Low"}.issubset(df.columns):
+        return df
+    hh = _rolling_max_shift1(df["High"].to_numpy(dtype=np.float64), bars)
+    ll = _rolling_min_shift1(df["Low"].to_numpy(dtype=np.float64), bars)
+    return df.assign(**{f"hh_{bars}": hh, f"ll_{bars}": ll})
@@ -1,31 +1,76 @@
 from __future__ import annotations
-from typing import Dict
+from dataclasses import dataclass
 import pandas as pd
 from analysis.indicators import add_indicators
-from analysis.regime import regime_signal
-from analysis.signals import entry_exit_on_m15
+from analysis.regime import Regime, regime_signal
+from analysis.signals import Trade, entry_exit_on_m15
+
+
+@dataclass(frozen=True, slots=True)
+class IndicatorParams:
+    """Indikator-Parameter aus cfg["params"], einmal je Strategie aufgelöst."""
+    adx_len: int = 14
+    rsi_len: int = 14
+    ema_fast: int = 50
+    psar_af: float = 0.02
+    psar_max_af: float = 0.2
+
+    @classmethod
+    def from_cfg(cls, p: dict) -> "IndicatorParams":
+        psar = p.get("psar", {})
+        return cls(adx_len=p.get("adx_len", 14), rsi_len=p.get("rsi_len", 14),
+                   ema_fast=p.get("ema_fast", 50),
+                   psar_af=psar.get("af", 0.02), psar_max_af=psar.get("max_af", 0.2))
+
+
+@dataclass(frozen=True, slots=True)
+class SignalParams:
+    """M15-Einstiegsregeln aus cfg["rules"], einmal je Strategie aufgelöst."""
+    pullback_atr_frac: float = 0.25
+    sl_atr_mult: float = 1.5
+    tp_atr_mult: float = 2.0
+
+    @classmethod
+    def from_cfg(cls, r: dict) -> "SignalParams":
+        return cls(pullback_atr_frac=r.get("pullback_atr_frac", 0.25),
+                   sl_atr_mult=r.get("sl_atr_mult", 1.5),
+                   tp_atr_mult=r.get("tp_atr_mult", 2.0))
+
+
+@dataclass(frozen=True, slots=True)
+class RegimeParams:
+    """Regime-Filter aus cfg["rules"], einmal je Strategie aufgelöst."""
+    adx_min: float = 0.0
+    ema50_slope_lookback: int = 50
+
+    @classmethod
+    def from_cfg(cls, r: dict) -> "RegimeParams":
+        return cls(adx_min=r.get("adx_min", 0.0),
+                   ema50_slope_lookback=r.get("ema50_slope_lookback", 50))
+
 
 class WilderStrategy:
     def __init__(self, cfg: dict):
         self.cfg = cfg
         self.p   = cfg["params"]
         self.r   = cfg["rules"]
+        self.ind = IndicatorParams.from_cfg(self.p)
+        self.sig = SignalParams.from_cfg(self.r)
+        self.reg = RegimeParams.from_cfg(self.r)
 
     def add_indics(self, df: pd.DataFrame) -> pd.DataFrame:
+        ind = self.ind
         return add_indicators(
             df,
-            ema_fast=self.p["ema_fast"], ema_slow=self.p["ema_slow"],
-            rsi_len=self.p["rsi_len"], adx_len=self.p["adx_len"],
-            atr_len=self.p["atr_len"], psar_af=self.p["psar"]["af"], psar_max_af=self.p["psar"]["max_af"]
+            adx_len=ind.adx_len, rsi_len=ind.rsi_len, ema_len=ind.ema_fast,
+            psar=True, psar_af=ind.psar_af, psar_max_af=ind.psar_max_af,
         )
 
-    def regime(self, d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame) -> Dict:
-        return regime_signal(d1, h4, h1,
-                             adx_min=self.r["adx_min"],
-                             ema50_slope_lookback=self.r["ema50_slope_lookback"])
+    def regime(self, d1: pd.DataFrame, h4: pd.DataFrame, h1: pd.DataFrame) -> Regime:
+        reg = self.reg
+        return regime_signal(d1, h4, h1, reg.adx_min, reg.ema50_slope_lookback)
 
-    def signal(self, m15: pd.DataFrame, bias: str) -> Dict:
-        return entry_exit_on_m15(m15, bias,
-                                 pullback_atr_frac=self.r["pullback_atr_frac"],
-                                 sl_atr_mult=self.r["sl_atr_mult"],
-                                 tp_atr_mult=self.r["tp_atr_mult"])
+    def signal(self, m15: pd.DataFrame, bias: str) -> Trade:
+        sig = self.sig
+        return entry_exit_on_m15(m15, bias, sig.pullback_atr_frac,
+                                 sig.sl_atr_mult, sig.tp_atr_mult)
@@ -3,17 +3,19 @@ import pandas as pd
 import numpy as np
 from analysis.regime import regime_signal
 
-# Dummy-Daten erzeugen (200 Stunden)
-idx = pd.date_range("2024-01-01", periods=200, freq="H")
+# Dummy-Daten erzeugen (200 Stunden) – einmal; regime_signal liest nur, daher
+# dient derselbe Frame als D1/H4/H1
+idx = pd.date_range("2024-01-01", periods=200, freq="h")
+t = np.linspace(0, 1, len(idx))
 
-def make_df():
-    df = pd.DataFrame(index=idx)
-    df["Close"] = 1 + np.sin(np.linspace(0, 10, len(idx)))
-    df["EMA_50"] = df["Close"].ewm(span=50, adjust=False).mean()
-    df["ADX_14"] = 20 + 5*np.sin(np.linspace(0, 3, len(idx)))
-    df["DMP_14"] = 25 + 5*np.sin(np.linspace(0, 2, len(idx)))
-    df["DMN_14"] = 20 + 5*np.cos(np.linspace(0, 2, len(idx)))
-    return df
+close = 1 + np.sin(10 * t)
+base = pd.DataFrame({
+    "Close": close,
+    "EMA_50": pd.Series(close).ewm(span=50, adjust=False).mean().to_numpy(),
+    "ADX_14": 20 + 5*np.sin(3 * t),
+    "DMP_14": 25 + 5*np.sin(2 * t),
+    "DMN_14": 20 + 5*np.cos(2 * t),
+}, index=idx)
 
-d1, h4, h1 = make_df(), make_df(), make_df()
+d1 = h4 = h1 = base
 print(regime_signal(d1, h4, h1))
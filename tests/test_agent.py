@@ -1 +1,282 @@
+import numpy as np
+import pandas as pd
+import pytest
 
+import agent
+
+
+def _frame(index, start=1.0):
+    n = len(index)
+    c = start + np.arange(n, dtype=np.float64)
+    return pd.DataFrame({"Open": c, "High": c + 1, "Low": c - 1, "Close": c}, index=index)
+
+
+def test_merge_mixed_timezones_gives_utc_index():
+    # Cache aus yf.download (intraday UTC), Nachlade-Teil aus Ticker.history (Europe/London)
+    cached = _frame(pd.date_range("2024-01-02 08:00", periods=12, freq="5min", tz="UTC"))
+    new = _frame(pd.date_range("2024-01-02 08:50", periods=6, freq="5min", tz="Europe/London"),
+                 start=100.0)
+    out = agent._merge(cached, new, "60d")
+    assert isinstance(out.index, pd.DatetimeIndex)
+    assert str(out.index.tz) == "UTC"
+    assert out.index.is_monotonic_increasing and out.index.is_unique
+    assert len(out) == 16                      # 10 alte + 6 neue (2 überschrieben)
+    assert out["Close"].iloc[10] == 100.0      # Überlappung: neue Bar gewinnt
+
+
+def test_merge_naive_daily_with_aware():
+    cached = _frame(pd.date_range("2024-01-01", periods=5, freq="D"))          # tz-naiv
+    new = _frame(pd.date_range("2024-01-05", periods=2, freq="D", tz="UTC"), start=50.0)
+    out = agent._merge(cached, new, "6mo")
+    assert str(out.index.tz) == "UTC"
+    assert len(out) == 6
+    assert out["Close"].iloc[-2] == 50.0
+
+
+def test_merged_frame_resamples():
+    cached = _frame(pd.date_range("2024-01-02 08:00", periods=24, freq="5min", tz="UTC"))
+    new = _frame(pd.date_range("2024-01-02 10:00", periods=12, freq="5min", tz="Europe/London"))
+    out = agent.resample_ohlc(agent._merge(cached, new, "60d"), "15min",
+                              label="left", closed="left")
+    assert len(out) == 12
+
+
+def test_utc_index_repairs_object_index():
+    # so sah ein bereits kaputt geschriebener Cache-Eintrag aus
+    a = _frame(pd.date_range("2024-06-03 08:00", periods=3, freq="5min", tz="UTC"))
+    b = _frame(pd.date_range("2024-06-03 09:15", periods=3, freq="5min", tz="Europe/London"))
+    broken = pd.concat([a, b])
+    assert not isinstance(broken.index, pd.DatetimeIndex)
+    fixed = agent._utc_index(broken)
+    assert str(fixed.index.tz) == "UTC"
+    assert fixed.index[3] == pd.Timestamp("2024-06-03 08:15", tz="UTC")
+
+
+def test_cache_fresh_capped_at_cron_cadence(monkeypatch):
+    now = 1_700_000_000.0 - (1_700_000_000.0 % 86400) + 3 * 3600 + 450   # 03:07:30 UTC
+    monkeypatch.setattr(agent.time, "time", lambda: now)
+    # D1-Eintrag von 00:07: gleiche Tagesbar, aber älter als ein Cron-Takt
+    assert not agent._cache_fresh(now - 3 * 3600, "1d")
+    assert agent._cache_fresh(now - 60, "1d")
+    assert agent._cache_fresh(now - 60, "5m")
+
+
+def test_prefetch_keeps_timezone_and_stores_utc(monkeypatch, tmp_path):
+    monkeypatch.setattr(agent, "CACHE_DIR", tmp_path)
+    seen = {}
+    idx = pd.date_range("2024-06-03", periods=3, freq="D", tz="Europe/London")
+
+    def fake_download(tickers, **kw):
+        seen.update(kw)
+        return pd.concat({t: _frame(idx) for t in tickers}, axis=1)
+
+    monkeypatch.setattr(agent.yf, "download", fake_download)
+    agent.prefetch(["EURUSD=X", "GBPUSD=X"], "1d", "6mo")
+    assert seen["ignore_tz"] is False
+    df, _ = agent._cache_load(agent._cache_path("EURUSD=X", "1d", "6mo"))
+    assert str(df.index.tz) == "UTC"
+    assert df.index[0] == pd.Timestamp("2024-06-02 23:00", tz="UTC")
+
+
+@pytest.mark.parametrize("row, want", [
+    ((3.0, 2.0, 1.0), "UP"),
+    ((3.0, 2.0, 2.0), "UP"),        # e50 == e200 zählt
+    ((3.0, 2.0, 2.5), "FLAT"),      # Preis über EMA50, aber EMA50 unter EMA200
+    ((1.0, 2.0, 3.0), "DOWN"),
+    ((1.0, 2.0, 2.0), "DOWN"),
+    ((1.0, 2.0, 1.5), "FLAT"),
+    ((2.0, 2.0, 1.0), "FLAT"),      # Preis == EMA50
+    ((np.nan, 2.0, 1.0), "FLAT"),
+    ((3.0, np.nan, 1.0), "FLAT"),
+    ((3.0, 2.0, np.nan), "FLAT"),
+])
+def test_detect_trends_truth_table(row, want):
+    assert agent.detect_trends(row).tolist() == [want]
+
+
+def test_detect_trends_rows():
+    rows = [(3.0, 2.0, 1.0), (1.0, 2.0, 3.0), (2.0, 2.0, 2.0)]
+    assert agent.detect_trends(rows).tolist() == ["UP", "DOWN", "FLAT"]
+
+
+class _FakeSMTP:
+    def __init__(self, fail=None):
+        self.sock = object()
+        self.fail = fail
+        self.sent = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sendmail(self, frm, to, data):
+        if self.fail is not None:
+            raise self.fail
+        self.sent.append(to)
+
+    def close(self):
+        self.sock = None
+
+
+def test_send_email_closes_disconnected_conn(monkeypatch):
+    for k, v in {"SMTP_USER": "u@x", "SMTP_PASS": "p", "EMAIL_TO": "a@x, b@x"}.items():
+        monkeypatch.setenv(k, v)
+    fresh = _FakeSMTP()
+    monkeypatch.setattr(agent, "_smtp_login", lambda *a: fresh)
+    for err in (agent.smtplib.SMTPServerDisconnected("idle timeout"),
+                TimeoutError("mitten in DATA"),
+                agent.smtplib.SMTPDataError(451, b"temporary failure")):
+        fresh.sent.clear()
+        dead = _FakeSMTP(fail=err)
+        assert agent.send_email("s", "K=V", {}, conn=dead)
+        assert dead.sock is None             # main verbindet daraufhin neu
+        assert fresh.sent == [["a@x", "b@x"]]
+
+    # abgelehnte Empfänger: Sitzung bleibt nutzbar, kein Einzelversand
+    fresh.sent.clear()
+    refused = _FakeSMTP(fail=agent.smtplib.SMTPRecipientsRefused({"a@x": (550, b"no")}))
+    assert not agent.send_email("s", "K=V", {}, conn=refused)
+    assert refused.sock is not None and fresh.sent == []
+
+    live = _FakeSMTP()
+    assert agent.send_email("s", "K=V", {}, conn=live)
+    assert live.sock is not None and live.sent == [["a@x", "b@x"]]
+
+
+def _utc(s):
+    return pd.Timestamp(s, tz="UTC").to_pydatetime()
+
+
+@pytest.mark.parametrize("now, want", [
+    # Winter (EST): Schluss Fr 22:00 UTC, Öffnung So 22:00 UTC
+    ("2024-01-12 21:59", None),
+    ("2024-01-12 22:00", "2024-01-12 22:00"),
+    ("2024-01-13 12:00", "2024-01-12 22:00"),
+    ("2024-01-14 21:59", "2024-01-12 22:00"),
+    ("2024-01-14 22:00", None),
+    # Sommer (EDT): Schluss Fr 21:00 UTC, Öffnung So 21:00 UTC
+    ("2024-07-12 20:59", None),
+    ("2024-07-12 21:00", "2024-07-12 21:00"),
+    ("2024-07-14 20:59", "2024-07-12 21:00"),
+    ("2024-07-14 21:00", None),
+    ("2024-07-10 12:00", None),
+])
+def test_fx_weekend_close(now, want):
+    got = agent._fx_weekend_close(_utc(now))
+    assert got == (None if want is None else _utc(want))
+
+
+def test_fx_weekend_done_needs_last_m15_bar():
+    symbols = ["EURUSD=X", "GBPUSD=X"]
+    now = _utc("2024-01-12 22:05")
+    bar = lambda s: pd.Timestamp(s, tz="UTC").value
+    # nur bis 21:00 ausgewertet (Läufe 21:15–21:45 ausgefallen) -> nachholen
+    assert not agent._fx_weekend_done(symbols, dict.fromkeys(symbols, bar("2024-01-12 21:00")), now)
+    done = dict.fromkeys(symbols, bar("2024-01-12 21:45"))
+    assert agent._fx_weekend_done(symbols, done, now)
+    assert not agent._fx_weekend_done(symbols, {"EURUSD=X": done["EURUSD=X"]}, now)
+    assert not agent._fx_weekend_done(symbols + ["^GSPC"], done, now)
+    assert not agent._fx_weekend_done(symbols, done, _utc("2024-01-12 21:50"))
+    # Sommer: letzte Bar 20:45 UTC
+    summer = dict.fromkeys(symbols, bar("2024-07-12 20:45"))
+    assert agent._fx_weekend_done(symbols, summer, _utc("2024-07-13 09:00"))
+
+
+def test_main_weekend_skip_reaches_done(monkeypatch, capsys):
+    stamp = pd.Timestamp("2024-01-12 21:45", tz="UTC").value
+    monkeypatch.setattr(agent, "utc_now", lambda: _utc("2024-01-13 10:00"))
+    monkeypatch.setattr(agent, "_state_load", lambda: {"EURUSD=X": stamp})
+    monkeypatch.setattr(agent, "prefetch",
+                        lambda syms, *a, **k: syms and pytest.fail("kein Download erwartet"))
+    monkeypatch.setattr(agent, "analyze_symbol", lambda *a, **k: pytest.fail("keine Analyse erwartet"))
+    monkeypatch.setattr("sys.argv", ["agent.py", "--symbols", "EURUSD=X"])
+    agent.main()
+    out = capsys.readouterr().out
+    assert "FX-Wochenende" in out and "[DONE] OK." in out
+
+
+def test_smtp_login_closes_on_failed_login(monkeypatch):
+    made = []
+
+    class Refusing(_FakeSMTP):
+        def __init__(self, *a, **k):
+            super().__init__()
+            made.append(self)
+
+        def ehlo(self):
+            pass
+
+        def starttls(self, **kw):
+            pass
+
+        def login(self, user, pw):
+            raise agent.smtplib.SMTPAuthenticationError(535, b"bad")
+
+    monkeypatch.setattr(agent.smtplib, "SMTP", Refusing)
+    with pytest.raises(agent.smtplib.SMTPAuthenticationError):
+        agent._smtp_login("u", "p", "smtp.test", 587)
+    assert made[0].sock is None
+
+
+def _ohlc_frame(index, seed=0):
+    rng = np.random.default_rng(seed)
+    c = 1.1 + np.cumsum(rng.normal(0, 5e-4, len(index)))
+    return pd.DataFrame({"Open": c, "High": c + 5e-4, "Low": c - 5e-4, "Close": c,
+                         "Volume": 0.0}, index=index)
+
+
+def _fake_downloads(monkeypatch):
+    base = _ohlc_frame(pd.date_range("2024-01-08", "2024-01-12 21:55", freq="5min", tz="UTC"))
+    daily = _ohlc_frame(pd.date_range("2023-07-01", periods=140, freq="D", tz="UTC"), seed=1)
+    calls = []
+
+    def fake(symbol, pairs, read_cache=True):
+        calls.append([iv for iv, _ in pairs])
+        return {iv: {"1d": daily, agent.BASE_INTERVAL: base}[iv].copy() for iv, _ in pairs}
+
+    monkeypatch.setattr(agent, "_download_many", fake)
+    return calls
+
+
+def test_analyze_symbol_skips_known_m15_stamp(monkeypatch):
+    calls = _fake_downloads(monkeypatch)
+    monkeypatch.setattr(agent, "ta_indicators", lambda df: pytest.fail("keine Indikatoren erwartet"))
+    last_m15 = pd.Timestamp("2024-01-12 21:45", tz="UTC").value
+    assert agent.analyze_symbol("EURUSD=X", last_m15, _utc("2024-01-12 22:00")) is None
+    assert calls == [["1d", agent.BASE_INTERVAL]]
+
+
+def test_analyze_symbol_new_bar_returns_payload_and_frames(monkeypatch):
+    _fake_downloads(monkeypatch)
+    old = pd.Timestamp("2024-01-12 21:30", tz="UTC").value
+    result = agent.analyze_symbol("EURUSD=X", old, _utc("2024-01-12 22:00"))
+    assert isinstance(result, tuple)
+    payload, frames = result
+    assert payload["ZeitUTC"] == "2024-01-12 22:00:00"
+    assert agent._m15_stamp(frames) == pd.Timestamp("2024-01-12 21:45", tz="UTC").value
+
+
+def test_cache_load_respects_read_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(agent, "CACHE_DIR", tmp_path)
+    path = agent._cache_path("EURUSD=X", "5m", "60d")
+    agent._cache_store(path, _frame(pd.date_range("2024-01-02", periods=3, freq="5min", tz="UTC")))
+    df, mtime = agent._cache_load(path)
+    assert len(df) == 3 and mtime > 0
+    assert agent._cache_load(path, read_cache=False) == (None, 0.0)
+
+
+def test_no_cache_flag_reaches_downloads(monkeypatch, tmp_path):
+    monkeypatch.setattr(agent, "CACHE_DIR", tmp_path)
+    seen = []
+    monkeypatch.setattr(agent, "prefetch", lambda *a, read_cache=True, **k: seen.append(read_cache))
+    monkeypatch.setattr(agent, "analyze_symbol", lambda sym, skip, now, read_cache=True:
+                        seen.append(read_cache))
+    monkeypatch.setattr("sys.argv", ["agent.py", "--symbols", "^GSPC", "--no-cache"])
+    agent.main()
+    assert seen == [False, False, False]
+    monkeypatch.setattr("sys.argv", ["agent.py", "--symbols", "^GSPC"])
+    seen.clear()
+    agent.main()
+    assert seen == [True, True, True]
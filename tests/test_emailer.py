@@ -0,0 +1,150 @@
+import smtplib
+import socket
+
+import pytest
+
+from utils import emailer
+
+
+class FakeSMTP:
+    """Minimaler SMTP-Server-Ersatz; protokolliert Logins, NOOPs und Mails."""
+    instances = []
+    fail_login = None     # Exception für den nächsten Login
+    noop_code = 250
+
+    def __init__(self, host=None, port=None, timeout=None, **kw):
+        self.host, self.port = host, port
+        self.ssl = "context" in kw
+        self.sock = socket.socket()   # echter Socket: _tune_socket / close prüfbar
+        self.sent = []
+        self.noops = 0
+        self.quit_called = False
+        self.fail_send = []           # Exceptions für die nächsten sendmail-Aufrufe
+        FakeSMTP.instances.append(self)
+
+    def ehlo(self, *a):
+        return 250, b"ok"
+
+    def starttls(self, **kw):
+        return 220, b"ok"
+
+    def login(self, user, pw):
+        if FakeSMTP.fail_login is not None:
+            err, FakeSMTP.fail_login = FakeSMTP.fail_login, None
+            raise err
+        return 235, b"ok"
+
+    def noop(self):
+        self.noops += 1
+        return FakeSMTP.noop_code, b""
+
+    def sendmail(self, frm, to, data):
+        if self.fail_send:
+            raise self.fail_send.pop(0)
+        self.sent.append((frm, list(to), data))
+        return {}
+
+    def quit(self):
+        self.quit_called = True
+        self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+@pytest.fixture
+def mailer(monkeypatch):
+    for k, v in {"SMTP_USER": "u@x", "SMTP_PASS": "p", "EMAIL_TO": "a@x, b@x",
+                 "SMTP_HOST": "smtp.test", "SMTP_PORT": "587"}.items():
+        monkeypatch.setenv(k, v)
+    monkeypatch.setattr(emailer.smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(emailer.smtplib, "SMTP_SSL", FakeSMTP)
+    FakeSMTP.instances = []
+    FakeSMTP.fail_login = None
+    FakeSMTP.noop_code = 250
+    emailer._cfg.cache_clear()
+    emailer._conn, emailer._conn_sent, emailer._conn_used = None, 0, 0.0
+    yield emailer
+    emailer.close()
+    emailer._cfg.cache_clear()
+
+
+def _sent(n=None):
+    return sum(len(s.sent) for s in FakeSMTP.instances[:n])
+
+
+def test_shared_connection_rotates_after_max(mailer):
+    for _ in range(205):
+        assert mailer.send_email("s", "<b>x</b>")
+    assert len(FakeSMTP.instances) == 3                 # 100 + 100 + 5
+    assert [len(s.sent) for s in FakeSMTP.instances] == [100, 100, 5]
+    assert all(s.quit_called for s in FakeSMTP.instances[:2])
+    assert FakeSMTP.instances[0].sent[0][1] == ["a@x", "b@x"]
+
+
+def test_idle_noop_keeps_live_connection(mailer):
+    mailer.send_email("s", "x")
+    mailer._conn_used -= mailer._IDLE_NOOP_S + 1
+    mailer.send_email("s", "x")
+    assert len(FakeSMTP.instances) == 1 and FakeSMTP.instances[0].noops == 1
+    mailer.send_email("s", "x")                          # nicht idle -> kein NOOP
+    assert FakeSMTP.instances[0].noops == 1
+
+
+def test_idle_noop_reconnects_dead_connection(mailer):
+    mailer.send_email("s", "x")
+    mailer._conn_used -= mailer._IDLE_NOOP_S + 1
+    FakeSMTP.noop_code = 421
+    mailer.send_email("s", "x")
+    first, second = FakeSMTP.instances
+    assert first.quit_called and len(first.sent) == 1 and len(second.sent) == 1
+
+
+def test_disconnect_reconnects_and_retries_once(mailer):
+    mailer.send_email("s", "x")
+    FakeSMTP.instances[0].fail_send = [smtplib.SMTPServerDisconnected("idle")]
+    assert mailer.send_email("s", "x")
+    assert len(FakeSMTP.instances) == 2 and _sent() == 2
+    assert mailer._conn is FakeSMTP.instances[1]
+
+
+@pytest.mark.parametrize("err", [TimeoutError("DATA"),
+                                 smtplib.SMTPDataError(451, b"temporary")])
+def test_send_error_drops_connection(mailer, err):
+    mailer.send_email("s", "x")
+    first = FakeSMTP.instances[0]
+    first.fail_send = [err]
+    with pytest.raises(type(err)):
+        mailer.send_email("s", "x")
+    assert mailer._conn is None and first.quit_called
+    assert mailer.send_email("s", "x")                   # nächster Versand verbindet neu
+    assert len(FakeSMTP.instances) == 2
+
+
+def test_recipients_refused_keeps_connection(mailer):
+    mailer.send_email("s", "x")
+    first = FakeSMTP.instances[0]
+    first.fail_send = [smtplib.SMTPRecipientsRefused({"a@x": (550, b"no")})]
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        mailer.send_email("s", "x")
+    assert mailer._conn is first and not first.quit_called
+
+
+def test_failed_login_closes_socket(mailer):
+    FakeSMTP.fail_login = smtplib.SMTPAuthenticationError(535, b"bad")
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        mailer.send_email("s", "x")
+    assert FakeSMTP.instances[0].sock is None and mailer._conn is None
+    assert mailer.send_email("s", "x")
+
+
+def test_port_465_and_close(mailer, monkeypatch):
+    monkeypatch.setenv("SMTP_PORT", "465")
+    mailer._cfg.cache_clear()
+    mailer.send_email("s", "x")
+    conn = FakeSMTP.instances[0]
+    assert conn.ssl and conn.port == 465
+    mailer.close()
+    assert conn.quit_called and mailer._conn is None
@@ -1 +1,193 @@
+import numpy as np
+import pandas as pd
+import pytest
 
+from analysis import indicators
+from analysis._kernels import (_adx_rsi_psar, _rolling_max_shift1, _rolling_min_shift1,
+                               _ta_core)
+
+
+def _ohlc(n=400, seed=7, nan_at=()):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-3, n))
+    high = close + rng.uniform(0, 2e-3, n)
+    low = close - rng.uniform(0, 2e-3, n)
+    for i in nan_at:
+        close[i] = high[i] = low[i] = np.nan
+    return close, high, low
+
+
+@pytest.mark.parametrize("w", [1, 3, 20])
+@pytest.mark.parametrize("nan_at", [(), (0,), (5, 6, 50), (399,)])
+def test_rolling_shift1_matches_pandas(w, nan_at):
+    x = _ohlc(nan_at=nan_at)[0]
+    s = pd.Series(x).shift(1).rolling(w)
+    np.testing.assert_array_equal(_rolling_max_shift1(x, w), s.max().to_numpy())
+    np.testing.assert_array_equal(_rolling_min_shift1(x, w), s.min().to_numpy())
+
+
+def test_rolling_shift1_short_input():
+    x = np.array([1.0, 2.0])
+    assert np.isnan(_rolling_max_shift1(x, 5)).all()
+    assert np.isnan(_rolling_min_shift1(x, 0)).all()
+
+
+def _ta_pandas(close, high, low, fast=50, slow=200, rsi_len=14, atr_len=14):
+    """Ursprüngliche pandas-Formeln aus agent.ta_indicators."""
+    c = pd.Series(close)
+    ema_f = c.ewm(span=fast, adjust=False).mean()
+    ema_s = c.ewm(span=slow, adjust=False).mean()
+    d = c.diff().to_numpy()
+    gain = np.where(d > 0, d, 0.0)
+    loss = np.where(d < 0, -d, 0.0)
+    up = pd.Series(gain).ewm(alpha=1 / rsi_len, adjust=False).mean()
+    down = pd.Series(loss).ewm(alpha=1 / rsi_len, adjust=False).mean()
+    rsi = 100 - (100 / (1 + up / down.replace(0, np.nan)))
+    h, l = pd.Series(high), pd.Series(low)
+    tr = pd.concat([(h - l).abs(), (h - c.shift()).abs(), (l - c.shift()).abs()],
+                   axis=1).max(axis=1)
+    atr = tr.ewm(alpha=1 / atr_len, adjust=False).mean()
+    return np.column_stack([ema_f, ema_s, rsi, atr])
+
+
+@pytest.mark.parametrize("nan_at", [(), (10, 11, 200)])
+def test_ta_core_matches_pandas_ewm(nan_at):
+    close, high, low = _ohlc(nan_at=nan_at)
+    got = _ta_core(close, high, low, 2.0 / 51, 2.0 / 201, 14, 14)
+    want = _ta_pandas(close, high, low)
+    # NaN-Close: EMA/ATR halten den Stand, die NaN-Differenz zählt als 0 (wie np.where)
+    np.testing.assert_allclose(got, want, rtol=1e-9, equal_nan=True)
+
+
+def test_ta_core_float32_close_to_float64():
+    close, high, low = _ohlc()
+    f64 = _ta_core(close, high, low, 2.0 / 51, 2.0 / 201, 14, 14)
+    f32 = _ta_core(close.astype(np.float32), high.astype(np.float32),
+                   low.astype(np.float32), 2.0 / 51, 2.0 / 201, 14, 14)
+    assert f32.dtype == np.float32
+    np.testing.assert_allclose(f32[20:, [0, 1, 3]], f64[20:, [0, 1, 3]], rtol=1e-4)
+
+
+def test_ta_core_empty():
+    e = np.empty(0)
+    assert _ta_core(e, e, e, 0.1, 0.1, 14, 14).shape == (0, 4)
+
+
+def _adx_pandas(high, low, close, length=14, rsi_len=14):
+    """ATR/+DI/-DI/ADX/RSI als ewm(alpha=1/N, adjust=False)-Formeln (Wilder)."""
+    h, l, c = pd.Series(high), pd.Series(low), pd.Series(close)
+    a = 1.0 / length
+    pc = c.shift()
+    tr = pd.concat([(h - l).abs(), (h - pc).abs(), (l - pc).abs()], axis=1).max(axis=1)
+    up, dn = h.diff(), -l.diff()
+    pos = pd.Series(np.where((up > dn) & (up > 0), up, 0.0))
+    neg = pd.Series(np.where((dn > up) & (dn > 0), dn, 0.0))
+    atr = tr.ewm(alpha=a, adjust=False).mean()
+    valid = (np.arange(len(c)) >= length) & (atr > 0)
+    dmp = (100 * pos.ewm(alpha=a, adjust=False).mean() / atr).where(valid)
+    dmn = (100 * neg.ewm(alpha=a, adjust=False).mean() / atr).where(valid)
+    sd = dmp + dmn
+    dx = (100 * (dmp - dmn).abs() / sd).where(sd > 0)
+    adx = dx.ewm(alpha=a, adjust=False).mean()
+    adx[: 2 * length - 1] = np.nan
+    d = c.diff().to_numpy()
+    g = pd.Series(np.where(d > 0, d, 0.0)).ewm(alpha=1 / rsi_len, adjust=False).mean()
+    ls = pd.Series(np.where(d < 0, -d, 0.0)).ewm(alpha=1 / rsi_len, adjust=False).mean()
+    rsi = (100 * g / (g + ls)).where(g + ls != 0)
+    rsi[:rsi_len] = np.nan
+    return [x.to_numpy() for x in (atr, dmp, dmn, adx, rsi)]
+
+
+@pytest.mark.parametrize("length, rsi_len", [(14, 14), (5, 9)])
+@pytest.mark.parametrize("nan_at", [(), (30, 31, 200)])
+def test_adx_rsi_psar_matches_pandas_ewm(length, rsi_len, nan_at):
+    close, high, low = _ohlc(nan_at=nan_at)
+    got = _adx_rsi_psar(high, low, close, length, rsi_len, 0.02, 0.2)
+    want = _adx_pandas(high, low, close, length, rsi_len)
+    for name, g, w in zip(("atr", "dmp", "dmn", "adx", "rsi"), got, want):
+        np.testing.assert_allclose(g, w, rtol=1e-9, equal_nan=True, err_msg=name)
+    # Warm-up-Bereiche
+    atr, dmp, dmn, adx, rsi, psar = got
+    assert np.isnan(dmp[:length]).all() and np.isnan(dmn[:length]).all()
+    assert np.isnan(adx[:2 * length - 1]).all() and not np.isnan(adx[2 * length - 1])
+    assert np.isnan(rsi[:rsi_len]).all() and not np.isnan(rsi[rsi_len])
+    assert not np.isnan(atr).any()
+
+
+def _psar_sides(high, low, psar):
+    """+1: SAR unter dem Bar (steigend), -1: über dem Bar (fallend)."""
+    side = np.where(psar[1:] <= low[1:], 1, np.where(psar[1:] >= high[1:], -1, 0))
+    assert (side != 0).all()          # SAR liegt nie innerhalb einer Bar
+    return np.concatenate([[0], side])
+
+
+def test_psar_invariants():
+    close, high, low = _ohlc(n=800, seed=11)
+    af0, max_af = 0.02, 0.2
+    psar = _adx_rsi_psar(high, low, close, 14, 14, af0, max_af)[5]
+    assert np.isnan(psar[0])
+    side = _psar_sides(high, low, psar)
+    start = 0
+    flips = 0
+    for i in range(2, len(psar)):
+        if side[i] != side[i - 1]:
+            # Umkehr: SAR springt auf den Extrempunkt des alten Trends (inkl. Bar i)
+            ext = low[start:i + 1].min() if side[i] == 1 else high[start:i + 1].max()
+            assert psar[i] == ext
+            start = i
+            flips += 1
+            continue
+        if side[i] == 1:
+            # an die Tiefs der zwei Vorbars geklemmt, Schritt höchstens max_af
+            assert psar[i] <= min(low[i - 1], low[i - 2])
+            ep = high[start:i].max()
+        else:
+            assert psar[i] >= max(high[i - 1], high[i - 2])
+            ep = low[start:i].min()
+        step = (psar[i] - psar[i - 1]) / (ep - psar[i - 1])
+        assert step <= max_af + 1e-12
+    assert flips > 5
+
+
+def test_psar_af_reaches_cap_in_steady_trend():
+    i = np.arange(200, dtype=np.float64)
+    low = 10.0 * i
+    high = low + 5.0
+    close = low + 2.5
+    psar = _adx_rsi_psar(high, low, close, 14, 14, 0.02, 0.2)[5]
+    assert (psar[1:] <= low[1:]).all()
+    step = (psar[2:] - psar[1:-1]) / (high[1:-1] - psar[1:-1])
+    assert step.max() <= 0.2 + 1e-12
+    np.testing.assert_allclose(step[-50:], 0.2)   # af = max_af, nicht weiter
+
+
+def test_adx_rsi_psar_empty_and_nan():
+    e = np.empty(0)
+    assert all(x.shape == (0,) for x in _adx_rsi_psar(e, e, e, 14, 14, 0.02, 0.2))
+    close, high, low = _ohlc(n=100, nan_at=(50,))
+    atr, dmp, dmn, adx, rsi, psar = _adx_rsi_psar(high, low, close, 14, 14, 0.02, 0.2)
+    assert np.isnan(psar[50]) and not np.isnan(psar[51])
+    assert atr[50] == atr[49]                      # NaN-Bar hält den Stand
+    nan = np.full(30, np.nan)
+    out = _adx_rsi_psar(nan, nan, nan, 14, 14, 0.02, 0.2)
+    assert all(np.isnan(x).all() for x in out)
+
+
+def test_add_indicators_columns_and_dtypes():
+    close, high, low = _ohlc()
+    idx = pd.date_range("2024-01-01", periods=len(close), freq="h", tz="UTC")
+    df = pd.DataFrame({"Open": close, "High": high, "Low": low, "Close": close}, index=idx)
+    out = indicators.add_indicators(df, adx_len=14, rsi_len=14, ema_len=50, psar=True)
+    assert list(df.columns) == ["Open", "High", "Low", "Close"]   # Eingabe unverändert
+    assert out.index.equals(df.index)
+    assert set(out.columns) == {"Open", "High", "Low", "Close",
+                                "ADX", "DMP", "DMM", "ATR", "RSI", "PSAR", "EMA_50"}
+    for c in ("ADX", "DMP", "DMM", "ATR", "RSI", "PSAR"):
+        assert out[c].dtype == np.float64, c
+    if indicators.FAST_KERNELS or indicators.ta is None:
+        assert out["EMA_50"].dtype == indicators.IND_DTYPE
+        want = _adx_pandas(high, low, close)
+        np.testing.assert_allclose(out["ADX"], want[3], rtol=1e-9, equal_nan=True)
+        np.testing.assert_allclose(out["RSI"], want[4], rtol=1e-9, equal_nan=True)
+    assert np.isnan(out["EMA_50"].to_numpy()[:49]).all()
+    assert indicators.add_indicators(df.iloc[:0]).empty
@@ -1 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
 
+from analysis.signals import _NO_SETUP, entry_exit_on_m15, entry_exit_on_m15_series
+
+
+def _m15(n=600, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 5e-4, n))
+    ema50 = pd.Series(close).ewm(span=50, adjust=False).mean().to_numpy()
+    # RSI pendelt um 50 -> viele Kreuzungen; ATR groß genug für Pullbacks
+    rsi = 50 + 8 * np.sin(np.arange(n) / 3.0) + rng.normal(0, 2, n)
+    atr = np.full(n, 4e-3)
+    psar = close + rng.choice([-1.0, 1.0], n) * 1e-3
+    df = pd.DataFrame({"Close": close, "EMA50": ema50, "RSI": rsi, "ATR": atr, "PSAR": psar},
+                      index=pd.date_range("2024-01-01", periods=n, freq="15min", tz="UTC"))
+    df.iloc[:14, df.columns.get_loc("RSI")] = np.nan   # Warm-up
+    return df
+
+
+@pytest.mark.parametrize("bias", ["UP", "DOWN", "NEUTRAL"])
+def test_series_matches_scalar(bias):
+    m15 = _m15()
+    ser = entry_exit_on_m15_series(m15, bias)
+    hits = 0
+    for i in range(1, len(m15) + 1):
+        t = entry_exit_on_m15(m15.iloc[:i], bias)
+        assert ser["action"][i - 1] == t.action
+        if t.action == "WAIT":
+            assert np.isnan(ser["entry"][i - 1])
+            continue
+        hits += 1
+        assert ser["entry"][i - 1] == pytest.approx(t.entry, abs=1e-12)
+        assert ser["sl"][i - 1] == pytest.approx(t.sl, abs=1e-12)
+        assert ser["tp"][i - 1] == pytest.approx(t.tp, abs=1e-12)
+    assert (hits > 0) == (bias != "NEUTRAL")
+
+
+def test_scalar_short_and_warmup():
+    m15 = _m15()
+    assert entry_exit_on_m15(m15.iloc[:10], "UP").note == "Zu wenige Bars"
+    m15.iloc[:30, m15.columns.get_loc("ATR")] = np.nan
+    assert entry_exit_on_m15(m15.iloc[:25], "UP") is _NO_SETUP   # ATR noch NaN
@@ -0,0 +1,45 @@
+# utils/_njit.py
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+# Numba ist optional: ohne Numba wird @njit zum No-op-Decorator,
+# die Kernel laufen dann als normales Python.
+try:
+    from numba import njit  # type: ignore
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Fallback: erlaubt sowohl @njit als auch @njit(cache=True, ...)."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def deco(func):
+            return func
+        return deco
+
+# AOT-Modul ta_kernels (build_kernels.py): nur verwenden, wenn es aus den
+# aktuellen Quellen gebaut wurde – ein liegengebliebenes .so würde sonst
+# Änderungen an analysis/_kernels.py stillschweigend überdecken.
+_ROOT = Path(__file__).resolve().parent.parent
+AOT_SOURCES = (_ROOT / "analysis" / "_kernels.py", _ROOT / "build_kernels.py")
+AOT_STAMP = _ROOT / "ta_kernels.sha256"
+
+
+def kernel_source_hash() -> str:
+    """SHA-256 über die Quellen des AOT-Moduls."""
+    h = hashlib.sha256()
+    for p in AOT_SOURCES:
+        h.update(p.read_bytes())
+    return h.hexdigest()
+
+
+def aot_kernels_current() -> bool:
+    """True, wenn der Stempel von build_kernels.py zu den aktuellen Quellen passt."""
+    try:
+        return AOT_STAMP.read_text().strip() == kernel_source_hash()
+    except OSError:
+        return False
@@ -1,27 +1,36 @@
 # utils/emailer.py
 from __future__ import annotations
-import os, smtplib, mimetypes
+import atexit, io, mmap, os, smtplib, socket, ssl, mimetypes, threading, time
+from base64 import encodebytes
+from functools import lru_cache
+from types import MappingProxyType
 from typing import List, Optional
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
-from email import encoders
+from email.generator import BytesGenerator
 from pathlib import Path
 
-try:
-    from dotenv import load_dotenv  # optional
-except Exception:
-    load_dotenv = None
-
 BASE_DIR = Path(__file__).resolve().parents[1]
 ENV_FILE = BASE_DIR / ".env"
 
+@lru_cache(maxsize=1)
 def _load_env_if_exists() -> None:
-    # .env nur laden, wenn vorhanden – und niemals Secrets aus os.environ überschreiben
-    if load_dotenv and ENV_FILE.exists():
-        load_dotenv(dotenv_path=str(ENV_FILE), override=False)
+    # .env nur laden, wenn vorhanden – und niemals Secrets aus os.environ überschreiben;
+    # einmal je Prozess (override=False: ein zweiter Parse ändert ohnehin nichts);
+    # python-dotenv (optional) erst hier importieren – der Modul-Import bleibt frei
+    if not ENV_FILE.exists():
+        return
+    try:
+        from dotenv import load_dotenv
+    except Exception:
+        return
+    load_dotenv(dotenv_path=str(ENV_FILE), override=False)
 
-def _cfg() -> dict:
+@lru_cache(maxsize=1)
+def _cfg() -> MappingProxyType:
+    # einmal je Prozess lesen (unvollständige Konfiguration wirft und wird
+    # nicht gecacht); schreibgeschützt, da alle Aufrufer dasselbe Objekt teilen
     _load_env_if_exists()
     cfg = {
         "EMAIL_TO" : os.getenv("EMAIL_TO"),
@@ -33,40 +42,170 @@ def _cfg() -> dict:
     missing = [k for k in ("EMAIL_TO","SMTP_USER","SMTP_PASS") if not cfg.get(k)]
     if missing:
         raise RuntimeError(f"SMTP env unvollständig: fehlend {', '.join(missing)}")
-    return cfg
+    # EMAIL_TO darf mehrere, kommagetrennte Adressen enthalten
+    cfg["EMAIL_TO_LIST"] = tuple(a.strip() for a in cfg["EMAIL_TO"].split(",") if a.strip())
+    print(f"[mailer] EMAIL_TO   = {cfg['EMAIL_TO']}\n"
+          f"[mailer] SMTP_USER  = {cfg['SMTP_USER']}\n"
+          f"[mailer] SMTP_PASS? = JA\n"
+          f"[mailer] HOST/PORT  = {cfg['SMTP_HOST']} {cfg['SMTP_PORT']}")
+    return MappingProxyType(cfg)
+
+# übliche Report-Anhänge direkt zuordnen; nur andere Endungen gehen über
+# mimetypes (dessen erster Aufruf die System-Typtabellen einliest)
+_EXT2CT = {
+    ".csv": ("text", "csv"),
+    ".html": ("text", "html"),
+    ".json": ("application", "json"),
+    ".pdf": ("application", "pdf"),
+    ".png": ("image", "png"),
+    ".txt": ("text", "plain"),
+}
+
+def _content_type(path: str) -> tuple:
+    ct = _EXT2CT.get(os.path.splitext(path)[1].lower())
+    if ct is not None:
+        return ct
+    ptype, enc = mimetypes.guess_type(path)
+    if enc: ptype = None
+    return tuple((ptype or "application/octet-stream").split("/", 1))
 
 def _attach(msg: MIMEMultipart, files: Optional[List[str]]) -> None:
-    for path in files or []:
-        ptype, enc = mimetypes.guess_type(path)
-        if enc: ptype = None
-        maintype, subtype = (ptype or "application/octet-stream").split("/", 1)
+    for path in files or ():
+        maintype, subtype = _content_type(path)
+        part = MIMEBase(maintype, subtype)
+        # base64 direkt aus der gemappten Datei (wie encoders.encode_base64, aber
+        # ohne Roh-Kopie im Speicher und ohne set_payload/get_payload-Umweg)
         with open(path, "rb") as f:
-            part = MIMEBase(maintype, subtype)
-            part.set_payload(f.read())
-        encoders.encode_base64(part)
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    data = encodebytes(mm)
+            else:
+                data = b""   # leere Datei: mmap verweigert Länge 0
+        part.set_payload(data.decode("ascii"))
+        part["Content-Transfer-Encoding"] = "base64"
         part.add_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
         msg.attach(part)
 
+# Eine angemeldete Verbindung je Prozess für mehrere Mails (TLS + Login nur
+# einmal); wird beim ersten Versand aufgebaut und bei Prozessende geschlossen.
+# Nach längerer Pause prüft ein NOOP, ob der Server sie noch hält; nach
+# _MAX_PER_CONN Mails wird rotiert (Provider begrenzen Mails je Sitzung).
+_conn: Optional[smtplib.SMTP] = None
+_conn_used = 0.0   # time.monotonic() des letzten Versands
+_conn_sent = 0
+_conn_lock = threading.Lock()
+_IDLE_NOOP_S = 90
+_MAX_PER_CONN = 100
+
+@lru_cache(maxsize=1)
+def _tls_context() -> ssl.SSLContext:
+    # CA-Bundle einmal je Prozess laden (starttls() ohne context baut jedes Mal neu)
+    return ssl.create_default_context()
+
+def _tune_socket(sock: socket.socket) -> None:
+    # Keep-Alive-Proben halten NAT-/Provider-Einträge der geteilten Verbindung
+    # warm, TCP_NODELAY schickt die kurzen SMTP-Befehle ohne Nagle-Verzögerung.
+    # TCP_KEEP* gibt es nicht überall (macOS: nur TCP_KEEPALIVE) -> getattr.
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for opt, val in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 15), ("TCP_KEEPCNT", 4)):
+            if hasattr(socket, opt):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, opt), val)
+    except OSError:
+        pass
+
+def _connect(cfg) -> smtplib.SMTP:
+    if cfg["SMTP_PORT"] == 465:
+        # implizites TLS ab dem TCP-Connect, kein EHLO/STARTTLS-Roundtrip
+        server = smtplib.SMTP_SSL(cfg["SMTP_HOST"], 465, timeout=30,
+                                  context=_tls_context())
+    else:
+        server = smtplib.SMTP(cfg["SMTP_HOST"], cfg["SMTP_PORT"], timeout=30)
+    try:
+        if cfg["SMTP_PORT"] != 465:
+            server.ehlo()
+            server.starttls(context=_tls_context())
+            server.ehlo()
+        _tune_socket(server.sock)
+        server.login(cfg["SMTP_USER"], cfg["SMTP_PASS"])
+    except BaseException:
+        server.close()  # Socket nicht offen liegen lassen (STARTTLS/Login fehlgeschlagen)
+        raise
+    return server
+
+def _drop() -> None:
+    # Aufrufer hält _conn_lock
+    global _conn
+    if _conn is not None:
+        try:
+            _conn.quit()
+        except Exception:
+            pass
+        _conn = None
+
+def _get_conn(cfg) -> smtplib.SMTP:
+    """Geteilte Verbindung liefern, bei Bedarf (neu) aufbauen. Aufrufer hält _conn_lock."""
+    global _conn, _conn_sent
+    if _conn is not None:
+        if _conn_sent >= _MAX_PER_CONN:
+            _drop()
+        elif time.monotonic() - _conn_used > _IDLE_NOOP_S:
+            try:
+                alive = _conn.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                alive = False
+            if not alive:
+                _drop()
+    if _conn is None:
+        _conn = _connect(cfg)
+        _conn_sent = 0
+    return _conn
+
+@atexit.register
+def close() -> None:
+    """Geteilte SMTP-Verbindung schließen (auch automatisch bei Prozessende)."""
+    with _conn_lock:
+        _drop()
+
 def send_email(subject: str, html: str, attachments: Optional[List[str]] = None) -> bool:
     cfg = _cfg()
-    msg = MIMEMultipart()
+    body = MIMEText(html or "(leer)", "html", "utf-8")
+    if attachments:
+        msg = MIMEMultipart()
+        msg.attach(body)
+        _attach(msg, attachments)
+    else:
+        msg = body  # ohne Anhänge kein multipart-Container nötig
     msg["From"] = cfg["SMTP_USER"]
-    msg["To"] = cfg["EMAIL_TO"]
+    msg["To"] = ", ".join(cfg["EMAIL_TO_LIST"])
     msg["Subject"] = subject
-    msg.attach(MIMEText(html or "(leer)", "html", "utf-8"))
-    _attach(msg, attachments)
-
-    print("[mailer] EMAIL_TO   =", cfg["EMAIL_TO"])
-    print("[mailer] SMTP_USER  =", cfg["SMTP_USER"])
-    print("[mailer] SMTP_PASS? =", "JA")
-    print("[mailer] HOST/PORT  =", cfg["SMTP_HOST"], cfg["SMTP_PORT"])
-    print("[mailer] Attachments:", attachments or "[]")
-
-    with smtplib.SMTP(cfg["SMTP_HOST"], cfg["SMTP_PORT"], timeout=30) as server:
-        server.ehlo()
-        server.starttls()
-        server.ehlo()
-        server.login(cfg["SMTP_USER"], cfg["SMTP_PASS"])
-        server.sendmail(cfg["SMTP_USER"], [cfg["EMAIL_TO"]], msg.as_string())
+
+    print(f"[mailer] Attachments: {attachments or '[]'}")
+
+    # direkt als Bytes serialisieren statt as_string() (kein str-Zwischenstand
+    # der base64-Anhänge)
+    buf = io.BytesIO()
+    BytesGenerator(buf).flatten(msg, linesep="\r\n")  # wie send_message
+
+    global _conn_used, _conn_sent
+    with _conn_lock:
+        try:
+            try:
+                _get_conn(cfg).sendmail(cfg["SMTP_USER"], cfg["EMAIL_TO_LIST"], buf.getvalue())
+            except smtplib.SMTPServerDisconnected as e:
+                # z.B. Idle-Timeout des Servers: einmal neu verbinden und wiederholen
+                print("[mailer] Verbindung getrennt, verbinde neu:", repr(e))
+                _drop()
+                _get_conn(cfg).sendmail(cfg["SMTP_USER"], cfg["EMAIL_TO_LIST"], buf.getvalue())
+        except smtplib.SMTPRecipientsRefused:
+            raise  # Sitzung bleibt gültig (smtplib setzt per RSET zurück)
+        except Exception:
+            # Zustand der Sitzung unklar (Timeout, 4xx/5xx mitten in DATA, ...):
+            # nicht weiterverwenden, der nächste Aufruf verbindet neu
+            _drop()
+            raise
+        _conn_used = time.monotonic()
+        _conn_sent += 1
     print("[mailer] Mail erfolgreich gesendet an", cfg["EMAIL_TO"])
     return True
@@ -1,11 +1,39 @@
 from __future__ import annotations
+import copy
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 import yaml, os
+import numpy as np
+import pandas as pd
+
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml (C), falls installiert
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+@lru_cache(maxsize=8)
+def _zi(tz: str) -> ZoneInfo:
+    """ZoneInfo-Objekt je TZ-Name nur einmal laden (erster Aufruf liest tzdata)."""
+    return ZoneInfo(tz)
 
 def now_tz(tz: str) -> datetime:
-    return datetime.now(ZoneInfo(tz))
+    return datetime.now(_zi(tz))
+
+@lru_cache(maxsize=32)
+def _load_yaml_cached(path: str, mtime_ns: int) -> dict:
+    # Bytes direkt an den Parser (erkennt UTF-8 selbst), wie yaml.safe_load
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=_YamlLoader)
 
 def load_yaml(path: str) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    """YAML laden; unveränderte Dateien (gleiche mtime) nur einmal parsen. Liefert
+    eine Kopie, damit Aufrufer den Cache nicht verändern."""
+    return copy.deepcopy(_load_yaml_cached(path, os.stat(path).st_mtime_ns))
+
+def decimate(y: pd.Series, n: int = 200) -> pd.Series:
+    """Gleichmäßig auf max. n Punkte ausdünnen (für kleine Charts optisch identisch)."""
+    if len(y) <= n:
+        return y
+    idx = np.linspace(0, len(y) - 1, n).astype(int)
+    return y.iloc[idx]
@@ -1,11 +1,15 @@
 import logging, os
 
-def get_logger(name="agent", level=os.environ.get("LOG_LEVEL","INFO")):
+# Formatter und Handler einmal je Prozess; alle benannten Logger teilen sie
+_FMT = logging.Formatter("[%(asctime)s] %(levelname)s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
+_HANDLER = logging.StreamHandler()
+_HANDLER.setFormatter(_FMT)
+
+def get_logger(name="agent", level=None):
     logger = logging.getLogger(name)
     if not logger.handlers:
-        logger.setLevel(level)
-        h = logging.StreamHandler()
-        fmt = logging.Formatter("[%(asctime)s] %(levelname)s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
-        h.setFormatter(fmt)
-        logger.addHandler(h)
+        logger.setLevel(level or os.environ.get("LOG_LEVEL", "INFO"))
+        logger.addHandler(_HANDLER)
+        # eigener Handler -> nicht zusätzlich über einen Root-Handler ausgeben
+        logger.propagate = False
     return logger